@@ -1,3 +1,4 @@
-from burndown.app import BurndownApp
+from burndown.app import main
 
-BurndownApp()
+if __name__ == "__main__":
+    main()
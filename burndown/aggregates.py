@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from burndown.dataset import per_dataset
+
+# Selectable histogram bin widths in months and close count frequencies
+BIN_WIDTHS = (0.25, 0.5, 1, 3, 6, 12)
+FREQUENCIES = {"D": "Day", "W": "Week", "MS": "Month"}
+
+
+class Aggregates:
+    """Summaries of one dataset that the histogram and bar figures draw from.
+
+    The sorted durations and the daily close counts are computed once, after
+    which any bin width or resampling frequency is a cheap pass over them.
+    Each is kept per repository when the dataset has a ``repo`` column.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        repos = df["repo"] if "repo" in df else pd.Series("", index=df.index)
+        self.months = {
+            repo: np.sort(group.to_numpy(dtype=float))
+            for repo, group in df["months"].groupby(repos, observed=True, sort=False)
+        }
+        self.all_months = np.sort(df["months"].to_numpy(dtype=float))
+        # Open issues have an end date of now so today is left out entirely
+        day = df["end_date"].dt.tz_localize(None).dt.normalize()
+        recent = day < pd.Timestamp(datetime.now().date())
+        self.daily = (
+            day[recent]
+            .groupby([repos[recent], day[recent]], observed=True, sort=False)
+            .size()
+            .rename("Count")
+        )
+
+    def histogram(self, bin_width: float, *, facet: bool) -> pd.DataFrame:
+        """Counts of durations in ``bin_width`` month bins aligned on 0."""
+        if not len(self.all_months):
+            return pd.DataFrame(columns=["repo", "months", "count"])
+        lo = min(np.floor(self.all_months[0] / bin_width) * bin_width, 0)
+        steps = int((self.all_months[-1] - lo) // bin_width) + 2
+        edges = lo + bin_width * np.arange(steps)
+        groups = self.months if facet else {"": self.all_months}
+        frames = [
+            pd.DataFrame({
+                "repo": repo,
+                "months": edges[:-1],
+                # Sorted durations make every bin count a binary search
+                "count": np.diff(np.searchsorted(months, edges)),
+            })
+            for repo, months in groups.items()
+        ]
+        stats = pd.concat(frames, ignore_index=True)
+        return stats[stats["count"] > 0]
+
+    def closed(self, freq: str, *, facet: bool) -> pd.DataFrame:
+        """Issues closed per ``freq`` period, leaving out empty periods."""
+        label = FREQUENCIES[freq]
+        daily = self.daily.rename_axis(["repo", label]).reset_index()
+        keys = ["repo"] if facet else []
+        stats = (
+            daily.groupby([*keys, pd.Grouper(key=label, freq=freq)], observed=True)[
+                "Count"
+            ]
+            .sum()
+            .reset_index()
+        )
+        return stats[stats["Count"] > 0]
+
+
+@per_dataset
+def aggregates(df: pd.DataFrame) -> Aggregates:
+    """The ``Aggregates`` of ``df``, computed on first use and kept with it."""
+    return Aggregates(df)
@@ -1,19 +1,53 @@
-from argparse import ArgumentParser
+from argparse import ArgumentParser, BooleanOptionalAction
+import atexit
+import json
+import os
+import shutil
 import sys
-from datetime import datetime
+import tempfile
+import time
+from datetime import datetime, timezone
+from functools import partial
+from importlib import import_module
 
-import pandas as pd
-from dash import Dash, Input, Output, State, dash_table, dcc, html
+import plotly.io as pio
+from dash import Dash, Input, Output, State, dash_table, dcc, html, no_update
+from flask import Response, g, request
 
-from burndown.figures import (
-    figure1,
-    figure2,
-    figure3,
-    figure4,
-    figure5,
-    figure6,
-    figure7,
-)
+from burndown import metrics
+from burndown.aggregates import BIN_WIDTHS, FREQUENCIES
+from burndown.cache import DataCache, iter_cached_fetch
+from burndown.client import DEFAULT_API_URL, token_scope
+from burndown.compression import ENCODINGS, compress_response
+from burndown.dataset import combine, prepare
+from burndown.downsample import MAX_POINTS
+from burndown.encoding import typed_builder
+from burndown.figures import FIGURES, figure_options
+from burndown.filters import Filters, apply_filters
+from burndown.jobs import FetchJob, FetchJobs
+from burndown.metrics import timed
+from burndown.prefetch import Prefetcher, parse_interval
+from burndown.repos import RepoAccess, expand_repos, iter_repos, parse_repos
+from burndown.store import DatasetStore, FigureCache
+from burndown.table import table_page
+from burndown.workers import FigurePool
+
+# Background fetches kept around for their pollers
+MAX_JOBS = 64
+# Filter controls, in the order of ``Filters.from_inputs``
+FILTER_CONTROLS = [
+    ("labels", "value"),
+    ("milestone", "value"),
+    ("author", "value"),
+    ("created", "start_date"),
+    ("created", "end_date"),
+]
+# burndown <command> runs the main function of these modules
+COMMANDS = {
+    "export": "burndown.export",
+    "bench": "burndown.benchmark",
+    "fake-api": "burndown.fake_api",
+}
 
 try:
     from waitress import serve
@@ -23,27 +57,220 @@ except ImportError:
     DEBUG = True
 
 
-def parse_args():
-    parser = ArgumentParser("Issue Burndown Graphs")
-
+def add_fetch_arguments(parser: ArgumentParser) -> None:
+    """Options shared by the dashboard and the headless export."""
     parser.add_argument("--debug", action="store_true", default=False)
     parser.add_argument("--rest", action="store_true", default=False)
+    parser.add_argument(
+        "--cache-dir",
+        default="~/.cache/burndown",
+        help="Directory for the on-disk cache of fetched repository data",
+    )
+    parser.add_argument("--no-cache", action="store_true", default=False)
+    parser.add_argument(
+        "--api-url",
+        default=DEFAULT_API_URL,
+        help="Base url of the github api (defaults to $GITHUB_API_URL or github.com)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of concurrent requests to the github api",
+    )
+    parser.add_argument(
+        "--repo-concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of repositories fetched at the same time",
+    )
+
+
+def add_figure_arguments(parser: ArgumentParser) -> None:
+    """Figure options shared by the dashboard, the export and the benchmarks."""
+    parser.add_argument(
+        "--max-points",
+        type=int,
+        default=MAX_POINTS,
+        help="Downsample figures with more markers or line points than this (0: never)",
+    )
+    parser.add_argument(
+        "--bin-width",
+        type=float,
+        default=1,
+        help="Width in months of the duration histogram bins",
+    )
+    parser.add_argument(
+        "--freq",
+        choices=list(FREQUENCIES),
+        default="D",
+        help="Period of the closed issue counts: D(ay), W(eek) or MS (month)",
+    )
+    parser.add_argument(
+        "--typed-arrays",
+        action=BooleanOptionalAction,
+        default=True,
+        help="Send figure dates and numbers as base64 typed arrays",
+    )
+
+
+def make_fetcher(args):
+    if args.rest:
+        from burndown.rest_api import iter_github_data
+    else:
+        from burndown.graphql_api import iter_github_data
+    return partial(
+        iter_github_data, concurrency=args.concurrency, api_url=args.api_url
+    )
+
+
+def parse_args():
+    parser = ArgumentParser(
+        "Issue Burndown Graphs",
+        epilog=(
+            "Other commands: 'burndown export' writes the figures without a"
+            " server, 'burndown bench' runs the benchmarks and 'burndown"
+            " fake-api' serves a local stand-in for the github api."
+        ),
+    )
+
+    add_fetch_arguments(parser)
+    add_figure_arguments(parser)
+    parser.add_argument(
+        "--store-size",
+        type=int,
+        default=8,
+        help="Number of datasets kept in server memory",
+    )
+    parser.add_argument(
+        "--store-dir",
+        default=None,
+        help="Optional directory to keep evicted datasets on disk",
+    )
+    parser.add_argument(
+        "--store-files",
+        type=int,
+        default=64,
+        help="Number of datasets kept in --store-dir, least recently used removed",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help=(
+            "Build figures in this many processes, which read datasets from"
+            " --store-dir (a temporary directory if unset)"
+        ),
+    )
+    parser.add_argument(
+        "--figure-cache-mb",
+        type=int,
+        default=256,
+        help="Memory budget for cached figures",
+    )
+    parser.add_argument(
+        "--prefetch",
+        default=None,
+        metavar="FILE",
+        help="File listing repositories (one org/repo entry per line) to keep warm",
+    )
+    parser.add_argument(
+        "--interval",
+        type=parse_interval,
+        default="15m",
+        help="How often to refresh prefetched repositories e.g. 30s, 15m, 1h",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=parse_interval,
+        default="1m",
+        help=(
+            "Reuse datasets fetched this recently, for anyone if the repositories"
+            " are public (at least --interval when prefetching)"
+        ),
+    )
+    parser.add_argument(
+        "--prefetch-token",
+        default=os.environ.get("GITHUB_TOKEN", ""),
+        help="Token used for prefetching (defaults to $GITHUB_TOKEN)",
+    )
+    parser.add_argument(
+        "--json-engine",
+        choices=["auto", "orjson", "json"],
+        default="auto",
+        help="Plotly JSON encoder for figures and callback responses",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=["auto", *ENCODINGS, "none"],
+        default="auto",
+        help="Compress responses (auto: brotli if installed, else gzip)",
+    )
+    parser.add_argument(
+        "--compression-level", type=int, default=6, help="gzip or brotli level"
+    )
+    parser.add_argument(
+        "--timing-log",
+        default=None,
+        metavar="FILE",
+        help="Append a JSON line with the timing of every http request to FILE",
+    )
     return parser.parse_args()
 
 
 class BurndownApp:
     def __init__(self, *, serve: bool = True):
         args = parse_args()
-        if args.rest:
-            from burndown.rest_api import fetch_github_data
-        else:
-            from burndown.graphql_api import fetch_github_data
-        self.fetcher = fetch_github_data
+        self.fetcher = make_fetcher(args)
 
         self.debug = DEBUG or args.debug
+        self.cache = None if args.no_cache else DataCache(args.cache_dir)
+        store_dir = args.store_dir
+        if args.workers and store_dir is None:
+            store_dir = tempfile.mkdtemp(prefix="burndown-store-")
+            atexit.register(shutil.rmtree, store_dir, ignore_errors=True)
+        self.store = DatasetStore(args.store_size, store_dir, args.store_files)
+        self.pool = None
+        if args.workers:
+            self.pool = FigurePool(
+                args.workers,
+                store_dir,
+                args.store_size,
+                typed_arrays=args.typed_arrays,
+                json_engine=args.json_engine,
+            )
+            atexit.register(self.pool.shutdown)
+        self.figures = FigureCache(args.figure_cache_mb * 2**20)
+        self.latest = {}
+        # Pinned in the store so prefetching never displaces user datasets
+        self.prefetched = {}
+        self.jobs = FetchJobs(MAX_JOBS)
+        self.access = RepoAccess(args.api_url)
+        self.repo_concurrency = args.repo_concurrency
+        self.api_url = args.api_url
+        self.timing_log = args.timing_log
+        self.max_points = args.max_points
+        self.bin_width = args.bin_width
+        self.freq = args.freq
+        self.typed_arrays = args.typed_arrays
+        pio.json.config.default_engine = args.json_engine
+        self.encodings = {"auto": ENCODINGS, "none": ()}.get(
+            args.compression, (args.compression,)
+        )
+        self.compression_level = args.compression_level
+        # Datasets younger than this are reused instead of fetched again
+        self.max_age = max(args.max_age, args.interval if args.prefetch else 0)
 
         self.app = self.create_app()
 
+        if args.prefetch:
+            self.prefetcher = Prefetcher(
+                partial(self.prefetch, token=args.prefetch_token),
+                args.prefetch,
+                args.interval,
+            )
+            self.prefetcher.start()
+
         if serve:
             self.serve()
 
@@ -54,9 +281,154 @@ class BurndownApp:
             print("address: http://127.0.0.1:8050")
             serve(self.app.server, host="0.0.0.0", port=8050)
 
+    def iter_dataset(
+        self, repos: list[str], token: str, filters: Filters | None = None
+    ):
+        """Yield ``(repo, batch, progress)`` for ``repos`` as pages arrive."""
+        yield from iter_repos(
+            partial(
+                iter_cached_fetch,
+                self.fetcher,
+                self.cache,
+                token=token,
+                debug=self.debug,
+                filters=filters,
+            ),
+            expand_repos(repos, token, self.api_url),
+            max_workers=self.repo_concurrency,
+        )
+
+    @timed(metrics.PUBLISH_SECONDS)
+    def publish(
+        self,
+        df,
+        previous: str | None = None,
+        filters: Filters | None = None,
+        scope: str = "",
+        *,
+        replace: bool = False,
+        pinned: bool = False,
+    ) -> str:
+        """Prepare and store ``df``, fetched for ``filters`` with the token of
+        ``scope``, replacing the dataset ``previous``.
+
+        With ``replace`` ``previous`` is dropped from the store, as partial
+        datasets are once the next one is published. ``pinned`` datasets are
+        kept until unpinned.
+        """
+        df = prepare(df)
+        df.attrs["fetched_at"] = datetime.now(timezone.utc)
+        df.attrs["filters"] = filters or Filters()
+        df.attrs["scope"] = scope
+        if replace:
+            key = self.store.replace(previous, df)
+        else:
+            key = self.store.put(df, pinned=pinned)
+        if previous is not None:
+            self.figures.invalidate(previous)
+        return key
+
+    def load_dataset(self, orgrepo: str, token: str) -> str | None:
+        """Fetch, prepare and store the dataset for ``orgrepo``, returning its key."""
+        if not (repos := parse_repos(orgrepo)):
+            return None
+
+        name = ", ".join(repos)
+        df = combine(batch for _, batch, _ in self.iter_dataset(repos, token))
+        self.latest[name] = self.publish(
+            df, self.latest.get(name), scope=token_scope(token), pinned=True
+        )
+        if (previous := self.prefetched.get(name)) is not None:
+            self.store.unpin(previous)
+        self.prefetched[name] = self.latest[name]
+        return self.latest[name]
+
+    def shareable(self, name: str, scope: str | None, token: str) -> bool:
+        """Whether data of the repositories ``name`` fetched with the token of
+        ``scope`` may be shown to the user of ``token``.
+
+        Private data is only shared between users of the same token.
+        """
+        if scope == token_scope(token):
+            return True
+        repos = parse_repos(name)
+        # Which repositories of an organisation are listed depends on the token
+        if any(repo.endswith("/*") for repo in repos):
+            return False
+        return self.access.public(token, repos)
+
+    def start_job(self, orgrepo: str, token: str, filters: Filters) -> str:
+        """Start fetching ``orgrepo`` in the background, or join a running
+        fetch of it the user may see, returning the job id."""
+        repos = parse_repos(orgrepo)
+        name = ", ".join(repos)
+        scope = token_scope(token)
+        job_id, started = self.jobs.submit(
+            name,
+            filters,
+            scope,
+            lambda: FetchJob(
+                name, partial(self.iter_dataset, repos, token, filters), filters, scope
+            ).start(),
+            lambda job: self.shareable(name, job.scope, token),
+        )
+        metrics.FETCHES.inc(outcome="started" if started else "joined")
+        return job_id
+
+    def fresh_dataset(self, orgrepo: str, filters: Filters, token: str) -> str | None:
+        """Key of a stored dataset for ``orgrepo`` younger than ``max_age``
+        that has every issue matching ``filters`` and the user may see."""
+        name = ", ".join(parse_repos(orgrepo))
+        if (df := self.store.get(self.latest.get(name))) is None:
+            return None
+        if not df.attrs.get("filters", Filters()).covers(filters):
+            return None
+        age = datetime.now(timezone.utc) - df.attrs["fetched_at"]
+        if age.total_seconds() >= self.max_age:
+            return None
+        if not self.shareable(name, df.attrs.get("scope"), token):
+            return None
+        metrics.FETCHES.inc(outcome="reused")
+        return self.latest[name]
+
+    def prefetch(self, orgrepo: str, token: str) -> None:
+        """Refresh ``orgrepo`` and build its default figures ahead of time."""
+        if (key := self.load_dataset(orgrepo, token)) is None:
+            return
+        df = self.store.get(key)
+        for tab in FIGURES:
+            self.figures.get_or_build(
+                key,
+                tab,
+                self.figure_builder(key, tab),
+                df,
+                **self.figure_options(tab, facet=False),
+            )
+
+    def figure_builder(self, key: str, tab: str, filters: Filters | None = None):
+        """Builder of figure ``tab``, in a worker process when there is a pool.
+
+        Workers filter the dataset ``key`` themselves, other builders are
+        given the filtered dataset.
+        """
+        if self.pool is not None:
+            return partial(self.pool.build, key, tab, filters=filters)
+        if self.typed_arrays:
+            return typed_builder(FIGURES[tab])
+        return FIGURES[tab]
+
+    def figure_options(self, tab: str, **options) -> dict:
+        defaults = {
+            "max_points": self.max_points,
+            "bin_width": self.bin_width,
+            "freq": self.freq,
+        }
+        return figure_options(tab, **{**defaults, **options})
+
     def create_app(self):
         # Configure the app
-        app = Dash(__name__)
+        # The data table is only created when its tab is selected
+        app = Dash(__name__, suppress_callback_exceptions=True)
 
         app.layout = html.Div(
             style={"padding": "20px", "fontFamily": "Arial, sans-serif"},
@@ -80,7 +452,10 @@ class BurndownApp:
                 dcc.Input(
                     id="orgrepo",
                     type="text",
-                    placeholder="Enter org/repo e.g. fusion-power-plant-framework/bluemira",
+                    placeholder=(
+                        "Enter org/repo e.g. fusion-power-plant-framework/bluemira,"
+                        " several separated by commas or org/* for a whole org"
+                    ),
                     value="fusion-power-plant-framework/bluemira",
                     style={"width": "50%", "padding": "10px", "marginBottom": "10px"},
                     debounce=True,
@@ -93,6 +468,68 @@ class BurndownApp:
                     style={"width": "50%", "padding": "10px", "marginBottom": "20px"},
                     debounce=True,
                 ),
+                dcc.Checklist(
+                    id="facet",
+                    options=[{"label": "Facet by repository", "value": "facet"}],
+                    value=[],
+                    style={"marginBottom": "10px"},
+                ),
+                html.Div(
+                    style={"display": "flex", "gap": "20px", "marginBottom": "10px"},
+                    children=[
+                        html.Label("Histogram bin (months)"),
+                        dcc.Dropdown(
+                            id="bin-width",
+                            options=sorted({*BIN_WIDTHS, self.bin_width}),
+                            value=self.bin_width,
+                            clearable=False,
+                            style={"width": "100px"},
+                        ),
+                        html.Label("Closed issues per"),
+                        dcc.Dropdown(
+                            id="freq",
+                            options=[
+                                {"label": label.lower(), "value": freq}
+                                for freq, label in FREQUENCIES.items()
+                            ],
+                            value=self.freq,
+                            clearable=False,
+                            style={"width": "120px"},
+                        ),
+                    ],
+                ),
+                html.Div(
+                    style={"display": "flex", "gap": "10px", "marginBottom": "10px"},
+                    children=[
+                        dcc.Input(
+                            id="labels",
+                            type="text",
+                            placeholder="Labels, any of, comma separated",
+                            debounce=True,
+                            style={"width": "25%", "padding": "10px"},
+                        ),
+                        dcc.Input(
+                            id="milestone",
+                            type="text",
+                            placeholder="Milestone",
+                            debounce=True,
+                            style={"padding": "10px"},
+                        ),
+                        dcc.Input(
+                            id="author",
+                            type="text",
+                            placeholder="Author",
+                            debounce=True,
+                            style={"padding": "10px"},
+                        ),
+                        dcc.DatePickerRange(
+                            id="created",
+                            start_date_placeholder_text="Created from",
+                            end_date_placeholder_text="Created to",
+                            clearable=True,
+                        ),
+                    ],
+                ),
                 html.Button(
                     "Submit",
                     id="submit-button",
@@ -106,13 +543,24 @@ class BurndownApp:
                         "borderRadius": "5px",
                     },
                 ),
+                dcc.Interval(id="freshness-timer", interval=60_000),
+                dcc.Interval(id="progress-timer", interval=1_000, disabled=True),
+                dcc.Store(id="job"),  # Id of the running background fetch
+                dcc.Store(
+                    id="github-data"
+                ),  # Key of the fetched data in the server-side store
+                html.Div(
+                    id="progress",
+                    style={"color": "#7f8c8d", "marginTop": "10px"},
+                ),
+                html.Div(
+                    id="filter-status",
+                    style={"color": "#7f8c8d", "marginTop": "10px"},
+                ),
                 dcc.Loading(
                     id="loading",
                     type="circle",  # You can also use "default" or "square"
                     children=[
-                        dcc.Store(
-                            id="github-data"
-                        ),  # Store for caching the fetched data
                         dcc.Tabs(
                             id="tabs",
                             value="plots-tab",
@@ -129,6 +577,10 @@ class BurndownApp:
                             style={"marginBottom": "20px"},
                             content_style={"padding": "20px"},
                         ),
+                        html.Div(
+                            id="freshness",
+                            style={"color": "#7f8c8d", "marginBottom": "10px"},
+                        ),
                         html.Div(id="content"),
                     ],
                 ),
@@ -136,64 +588,240 @@ class BurndownApp:
         )
 
         @app.callback(
-            [Output("github-data", "data"), Output("submit-button", "n_clicks")],
+            [
+                Output("github-data", "data"),
+                Output("submit-button", "n_clicks"),
+                Output("job", "data"),
+                Output("progress-timer", "disabled"),
+            ],
             Input("submit-button", "n_clicks"),
             State("submit-button", "n_clicks"),
             Input("orgrepo", "value"),
             Input("token", "value"),
+            *[State(*control) for control in FILTER_CONTROLS],
         )
+        @timed(metrics.CALLBACK_SECONDS, callback="update_data")
         def update_data(
             n_clicks: int,
             current_n_clicks: int,
             orgrepo: str,
             token: str,
-        ) -> tuple[str, int]:
-            if n_clicks == 0 or orgrepo == "" or "/" not in orgrepo:
-                return None, 0
+            *filter_inputs,
+        ) -> tuple[str, int, str, bool]:
+            if n_clicks == 0 or not parse_repos(orgrepo):
+                return None, 0, None, True
 
-            df = self.fetcher(orgrepo, token, debug=self.debug)
-            df["created_at"] = pd.to_datetime(df["created_at"])
-            df["closed_at"] = pd.to_datetime(df["closed_at"])
-            df["end_date"] = df["closed_at"].fillna(datetime.now())
-            df["end_date"] = pd.to_datetime(df["end_date"], utc=True)
-            df["months"] = (df["end_date"] - df["created_at"]).dt.days / 30
+            # Filters are pushed down to the fetch on submit and applied to
+            # the loaded dataset whenever they change
+            filters = Filters.from_inputs(*filter_inputs)
+            if (key := self.fresh_dataset(orgrepo, filters, token)) is not None:
+                return key, 0, None, True
+            return no_update, 0, self.start_job(orgrepo, token, filters), False
 
-            return df.to_dict("records"), 0
+        @app.callback(
+            Output("github-data", "data", allow_duplicate=True),
+            Output("progress", "children"),
+            Output("progress-timer", "disabled", allow_duplicate=True),
+            Input("progress-timer", "n_intervals"),
+            State("job", "data"),
+            State("github-data", "data"),
+            prevent_initial_call=True,
+        )
+        @timed(metrics.CALLBACK_SECONDS, callback="update_progress")
+        def update_progress(_n_intervals, job_id, current):
+            # Publish what has been fetched so far whenever new pages arrive.
+            # Everyone polling a shared fetch gets the same published dataset
+            if (job := self.jobs.get(job_id)) is None:
+                return no_update, "", True
+            with job.publishing:
+                done = job.done
+                if job.version != job.published:
+                    df, version = job.snapshot()
+                    if not df.empty:
+                        job.key = self.publish(
+                            df, job.key, job.filters, job.scope, replace=True
+                        )
+                    # Publish again if the fetch finished after ``done`` was read
+                    job.published = version if done or not job.done else -1
+                    if done and job.error is None and job.key is not None:
+                        if (previous := self.latest.get(job.name)) is not None:
+                            self.figures.invalidate(previous)
+                        self.latest[job.name] = job.key
+                key = job.key
+            if key is None or key == current:
+                return no_update, job.status(), done
+            return key, job.status(), done
 
         @app.callback(
             Output("content", "children"),
             Input("tabs", "value"),
             Input("github-data", "data"),
+            Input("facet", "value"),
+            Input("bin-width", "value"),
+            Input("freq", "value"),
+            *[Input(*control) for control in FILTER_CONTROLS],
         )
-        def update_content(tab, data):
-            if data is None:
+        @timed(metrics.CALLBACK_SECONDS, callback="update_content")
+        def update_content(tab, key, facet, bin_width, freq, *filter_inputs):
+            if key is None:
                 return []
 
-            df = pd.DataFrame(data)
-
-            if tab == "p1":
-                return dcc.Graph(figure=figure1(df))
-            if tab == "p2":
-                return dcc.Graph(figure=figure2(df))
-            if tab == "p3":
-                return dcc.Graph(figure=figure3(df))
-            if tab == "p4":
-                return dcc.Graph(figure=figure4(df))
-            if tab == "p5":
-                return dcc.Graph(figure=figure5(df))
-            if tab == "p6":
-                return dcc.Graph(figure=figure6(df))
-            if tab == "p7":
-                return dcc.Graph(figure=figure7(df))
+            if (df := self.store.get(key)) is None:
+                return html.P("This dataset has expired, please submit again.")
+
+            filters = Filters.from_inputs(*filter_inputs)
+            if (view := apply_filters(df, filters)).empty:
+                return html.P("No issues or pull requests match the filters.")
+            if tab in FIGURES:
+                return dcc.Graph(
+                    figure=self.figures.get_or_build(
+                        view_key(key, filters),
+                        tab,
+                        self.figure_builder(key, tab, filters),
+                        view,
+                        **self.figure_options(
+                            tab,
+                            facet="facet" in (facet or []),
+                            bin_width=bin_width or self.bin_width,
+                            freq=freq or self.freq,
+                        ),
+                    )
+                )
             if tab == "table-tab":
                 # Data Table
+                # Paging, sorting and filtering happen server-side in update_table
                 return dash_table.DataTable(
-                    data=df.to_dict("records"),
+                    id="table",
                     columns=[{"name": i, "id": i} for i in df.columns],
+                    page_current=0,
                     page_size=10,
+                    page_action="custom",
+                    sort_action="custom",
+                    sort_mode="multi",
+                    sort_by=[],
+                    filter_action="custom",
+                    filter_query="",
                     style_table={"overflowX": "auto"},
                     style_cell={"textAlign": "left"},
                 )
             return []
 
+        @app.callback(
+            Output("table", "data"),
+            Output("table", "page_count"),
+            Input("table", "page_current"),
+            Input("table", "page_size"),
+            Input("table", "sort_by"),
+            Input("table", "filter_query"),
+            State("github-data", "data"),
+            *[State(*control) for control in FILTER_CONTROLS],
+        )
+        @timed(metrics.CALLBACK_SECONDS, callback="update_table")
+        def update_table(
+            page_current, page_size, sort_by, filter_query, key, *filter_inputs
+        ):
+            if (df := self.store.get(key)) is None:
+                return [], 1
+            df = apply_filters(df, Filters.from_inputs(*filter_inputs))
+            return table_page(df, page_current, page_size, sort_by, filter_query)
+
+        @app.callback(
+            Output("filter-status", "children"),
+            Input("github-data", "data"),
+            *[Input(*control) for control in FILTER_CONTROLS],
+        )
+        @timed(metrics.CALLBACK_SECONDS, callback="update_filter_status")
+        def update_filter_status(key, *filter_inputs):
+            filters = Filters.from_inputs(*filter_inputs)
+            if not filters or (df := self.store.get(key)) is None:
+                return ""
+            status = (
+                f"{len(apply_filters(df, filters)):,} of {len(df):,} issues and"
+                f" pull requests {filters.describe()}."
+            )
+            if not (fetched := df.attrs.get("filters", Filters())).covers(filters):
+                status += (
+                    f" Only those {fetched.describe()} were fetched,"
+                    " submit to fetch the rest."
+                )
+            return status
+
+        @app.callback(
+            Output("freshness", "children"),
+            Input("github-data", "data"),
+            Input("freshness-timer", "n_intervals"),
+        )
+        @timed(metrics.CALLBACK_SECONDS, callback="update_freshness")
+        def update_freshness(key, _n_intervals):
+            if (df := self.store.get(key)) is None:
+                return ""
+            fetched_at = df.attrs["fetched_at"]
+            minutes = (datetime.now(timezone.utc) - fetched_at).total_seconds() // 60
+            return (
+                f"Data fetched {fetched_at:%Y-%m-%d %H:%M} UTC"
+                f" ({minutes:.0f} minutes ago)"
+            )
+
+        @app.server.route("/figure-cache")
+        def figure_cache_stats():
+            return self.figures.stats()
+
+        @app.server.route("/metrics")
+        def metrics_page():
+            return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+        self.instrument(app.server)
         return app
+
+    def instrument(self, server) -> None:
+        """Time every http request and optionally log it as a JSON line."""
+
+        @server.before_request
+        def start_timer():
+            g.started = time.perf_counter()
+
+        @server.after_request
+        def record_timing(response):
+            size = response.calculate_content_length() or 0
+            if self.encodings:
+                response = compress_response(
+                    response,
+                    request.headers.get("Accept-Encoding", ""),
+                    allowed=self.encodings,
+                    level=self.compression_level,
+                )
+            sent = response.calculate_content_length() or 0
+            seconds = time.perf_counter() - g.get("started", time.perf_counter())
+            # Label by route rather than path to keep the label set bounded
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            metrics.HTTP_SECONDS.observe(seconds, path=route)
+            metrics.HTTP_BYTES.inc(size, path=route)
+            metrics.HTTP_SENT_BYTES.inc(sent, path=route)
+            if self.timing_log:
+                body = request.get_json(silent=True) if request.is_json else None
+                entry = {
+                    "time": datetime.now(timezone.utc).isoformat(),
+                    "method": request.method,
+                    "path": request.path,
+                    "callback": (body or {}).get("output"),
+                    "status": response.status_code,
+                    "seconds": round(seconds, 6),
+                    "bytes": size,
+                    "sent_bytes": sent,
+                    "encoding": response.headers.get("Content-Encoding"),
+                }
+                with open(self.timing_log, "a") as log:
+                    log.write(json.dumps(entry) + "\n")
+            return response
+
+
+def view_key(key: str, filters: Filters) -> str:
+    """Key of the figures of dataset ``key`` filtered by ``filters``."""
+    return f"{key}:{filters.key()}" if filters else key
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        import_module(COMMANDS[sys.argv[1]]).main(sys.argv[2:])
+    else:
+        BurndownApp()
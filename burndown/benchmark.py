@@ -0,0 +1,230 @@
+import gzip
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+import plotly
+import plotly.graph_objects as go
+
+from burndown import graphql_api, rest_api
+from burndown.app import add_figure_arguments
+from burndown.aggregates import Aggregates
+from burndown.client import ETAGS
+from burndown.dataset import combine, prepare
+from burndown.encoding import typed_arrays
+from burndown.fake_api import FakeGitHub, url
+from burndown.figures import FIGURES, figure_options
+from burndown.filters import FilterIndex, Filters
+from burndown.rest_api import PER_PAGE
+from burndown.synthetic import synthetic_frame
+from burndown.table import table_page
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+
+def parse_args(argv=None):
+    parser = ArgumentParser(
+        "burndown bench",
+        description="Time the data preparation and figures on synthetic datasets",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=list(SIZES),
+        help="Numbers of issues and pull requests to generate",
+    )
+    parser.add_argument("--repos", type=int, default=1)
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per case, the fastest is kept"
+    )
+    parser.add_argument(
+        "--figures",
+        nargs="+",
+        choices=list(FIGURES),
+        default=list(FIGURES),
+    )
+    parser.add_argument("--facet", action="store_true", default=False)
+    add_figure_arguments(parser)
+    parser.add_argument(
+        "--fetch",
+        action="store_true",
+        default=False,
+        help="Also time both fetchers against a local fake github api",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="Seconds of latency per fake api request",
+    )
+    parser.add_argument("--out", default="benchmark.json", help="Results file")
+    parser.add_argument(
+        "--compare", default=None, metavar="FILE", help="Earlier results to compare to"
+    )
+    return parser.parse_args(argv)
+
+
+def measure(
+    func, *args, repeat: int = 1, setup=None, **kwargs
+) -> tuple[object, dict]:
+    """Result of ``func`` with its best time and traced peak memory.
+
+    Timing runs are kept separate from the single ``tracemalloc`` run as
+    tracing slows allocation heavy code down considerably. ``setup()``, if
+    given, is called before every run, untimed, for a fresh first argument.
+    """
+    seconds = []
+    for _ in range(max(repeat, 1)):
+        run_args = (setup(), *args) if setup else args
+        start = time.perf_counter()
+        result = func(*run_args, **kwargs)
+        seconds.append(time.perf_counter() - start)
+    run_args = (setup(), *args) if setup else args
+    tracemalloc.start()
+    try:
+        func(*run_args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {"seconds": min(seconds), "peak_bytes": peak}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_size(rows: int, args) -> list[dict]:
+    raw = synthetic_frame(rows, repos=args.repos)
+    # Pages as the fetchers yield them and update_data combines them
+    batches = [raw.iloc[i : i + PER_PAGE] for i in range(0, rows, PER_PAGE)]
+    results = []
+
+    def record(case, func, *fargs, **kwargs):
+        try:
+            value, stats = measure(func, *fargs, repeat=args.repeat, **kwargs)
+        except Exception as error:  # noqa: BLE001
+            value, stats = None, {"error": f"{type(error).__name__}: {error}"}
+        results.append({"rows": rows, "case": case, **stats})
+        if "error" in stats:
+            print(f"{rows:>9} {case:<20} {stats['error']}")
+        else:
+            print(
+                f"{rows:>9} {case:<20} {stats['seconds']:>8.3f} s"
+                f" {stats['peak_bytes'] / 2**20:>8.1f} MiB"
+            )
+        return value, results[-1]
+
+    if args.fetch:
+        server = FakeGitHub(issues=rows, latency=args.latency).start()
+        for backend in (rest_api, graphql_api):
+
+            def fetch(fetch_github_data=backend.fetch_github_data):
+                # Every run starts cold rather than revalidating by ETag
+                ETAGS.clear()
+                return fetch_github_data(
+                    "synthetic/repo", "", debug=False, api_url=url(server)
+                )
+
+            record(f"fetch {backend.__name__.split('.')[-1]}", fetch)
+        server.shutdown()
+        server.server_close()
+
+    df, _ = record("combine", combine, batches)
+    df, _ = record("prepare", prepare, df)
+    if df is None:
+        return results
+    sort_by = [{"column_id": "months", "direction": "desc"}]
+    record("table", table_page, df, 0, 10, sort_by, "")
+    index, _ = record("filter.index", FilterIndex, df)
+    if index is not None:
+        filters = Filters(("bug", "question"), "v1.0", None, "2022-01-01", "2023-12-31")
+        record("filter.mask", index.mask, filters)
+    record("aggregates", Aggregates, df)
+    for tab in args.figures:
+        name = FIGURES[tab].__name__
+        options = figure_options(
+            tab,
+            facet=args.facet,
+            max_points=args.max_points,
+            bin_width=args.bin_width,
+            freq=args.freq,
+        )
+        # Figures cache aggregates per dataset, so each run gets a copy to
+        # time them cold
+        fig, _ = record(name, FIGURES[tab], setup=df.copy, **options)
+        if fig is None:
+            continue
+        if args.typed_arrays:
+            # Encoding changes the figure in place, so every run gets a copy
+            typed, _ = record(
+                f"{name}.typed_arrays", typed_arrays, setup=lambda: go.Figure(fig)
+            )
+            fig = fig if typed is None else typed
+        payload, result = record(f"{name}.to_json", fig.to_json)
+        if payload is not None:
+            result["json_bytes"] = len(payload.encode())
+            result["gzip_bytes"] = len(gzip.compress(payload.encode()))
+    return results
+
+
+def compare(results: list[dict], path: str) -> None:
+    """Print the change in time and memory against an earlier results file."""
+    baseline = {
+        (r["rows"], r["case"]): r
+        for r in json.loads(Path(path).read_text())["results"]
+    }
+    print(f"{'rows':>9} {'case':<20} {'time':>8} {'memory':>8}")
+    for result in results:
+        old = baseline.get((result["rows"], result["case"]), {"error": None})
+        if "error" in result or "error" in old:
+            continue
+        time_ratio = result["seconds"] / max(old["seconds"], 1e-9)
+        memory_ratio = result["peak_bytes"] / max(old["peak_bytes"], 1)
+        print(
+            f"{result['rows']:>9} {result['case']:<20}"
+            f" {time_ratio:>7.2f}x {memory_ratio:>7.2f}x"
+        )
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    results = []
+    for rows in args.sizes:
+        results.extend(run_size(rows, args))
+
+    Path(args.out).write_text(
+        json.dumps(
+            {
+                "commit": git_commit(),
+                "date": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "plotly": plotly.__version__,
+                "repos": args.repos,
+                "facet": args.facet,
+                "max_points": args.max_points,
+                "typed_arrays": args.typed_arrays,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"Results written to {args.out}")
+    if args.compare:
+        compare(results, args.compare)
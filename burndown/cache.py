@@ -0,0 +1,142 @@
+import json
+import sqlite3
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from burndown.dataset import COLUMNS, Progress, combine, to_strings, typed
+from burndown.filters import Filters
+
+
+class DataCache:
+    """On-disk store of fetched repository data keyed by org/repo.
+
+    Rows are upserted on ``(orgrepo, issue_number)`` so an incremental fetch
+    only has to return the issues and PRs updated since the last sync.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / "burndown.sqlite"
+        with self.connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS issues ("
+                " orgrepo TEXT, issue_number INTEGER, title TEXT,"
+                " created_at TEXT, closed_at TEXT, is_pr INTEGER,"
+                " labels TEXT, milestone TEXT, author TEXT,"
+                " PRIMARY KEY (orgrepo, issue_number))"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS sync"
+                " (orgrepo TEXT PRIMARY KEY, synced_at TEXT)"
+            )
+            columns = {row[1] for row in con.execute("PRAGMA table_info(issues)")}
+            if "labels" not in columns:
+                # Caches from before labels, milestones and authors were kept
+                # are fetched in full once to fill them in
+                for column in ("labels", "milestone", "author"):
+                    con.execute(f"ALTER TABLE issues ADD COLUMN {column} TEXT")
+                con.execute("DELETE FROM sync")
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def last_sync(self, orgrepo: str) -> str | None:
+        with self.connect() as con:
+            row = con.execute(
+                "SELECT synced_at FROM sync WHERE orgrepo = ?", (orgrepo,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def repos(self) -> list[str]:
+        """Every repository with a completed sync."""
+        with self.connect() as con:
+            return [row[0] for row in con.execute("SELECT orgrepo FROM sync")]
+
+    def load(self, orgrepo: str) -> pd.DataFrame:
+        with self.connect() as con:
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(COLUMNS)} FROM issues WHERE orgrepo = ?"
+                " ORDER BY is_pr, issue_number DESC",
+                con,
+                params=(orgrepo,),
+            )
+        df["labels"] = [tuple(json.loads(labels or "[]")) for labels in df["labels"]]
+        return typed(df)
+
+    def update(self, orgrepo: str, df: pd.DataFrame, synced_at: str) -> None:
+        rows = [
+            (
+                orgrepo,
+                int(no),
+                title,
+                created,
+                closed,
+                bool(is_pr),
+                json.dumps(list(labels)),
+                milestone,
+                author,
+            )
+            for no, title, created, closed, is_pr, labels, milestone, author in df[
+                COLUMNS
+            ].itertuples(index=False)
+        ]
+        with self.connect() as con:
+            con.executemany(
+                f"INSERT OR REPLACE INTO issues ({', '.join(['orgrepo', *COLUMNS])})"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            con.execute(
+                "INSERT OR REPLACE INTO sync VALUES (?, ?)", (orgrepo, synced_at)
+            )
+
+
+def iter_cached_fetch(
+    fetcher,
+    cache: DataCache | None,
+    orgrepo: str,
+    token: str,
+    *,
+    debug: bool,
+    filters: Filters | None = None,
+) -> Iterator[tuple[pd.DataFrame, Progress]]:
+    """Yield the cached records then batches changed since the last sync.
+
+    ``fetcher`` is an ``iter_github_data`` style generator. The cache is
+    shared by every token, so cached records are only yielded once a request
+    with ``token`` has succeeded, and it is only updated once the fetch has
+    run to completion. Debug runs stop after a few
+    pages so they bypass the cache entirely, as do ``filters`` pushed down
+    to a repository that has not been cached, which would only fetch part
+    of it. Cached repositories are synced in full and filtered in memory.
+    """
+    if cache is None or debug or (filters and cache.last_sync(orgrepo) is None):
+        yield from fetcher(orgrepo, token, debug=debug, filters=filters)
+        return
+
+    synced_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    since = cache.last_sync(orgrepo)
+    cached = cache.load(orgrepo) if since is not None else None
+    batches = []
+    for batch, progress in fetcher(orgrepo, token, debug=debug, since=since):
+        # A page came back, so the token can read the repository
+        if cached is not None:
+            yield cached, Progress()
+            cached = None
+        batches.append(batch)
+        yield batch, progress
+    if cached is not None:
+        yield cached, Progress()
+    cache.update(orgrepo, to_strings(combine(batches)), synced_at)
+
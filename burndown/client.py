@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from burndown import metrics
+
+API_URL = "https://api.github.com"
+# Base url used when none is given, e.g. a GitHub Enterprise or local stand-in
+DEFAULT_API_URL = os.environ.get("GITHUB_API_URL", API_URL)
+RETRY_STATUS = {500, 502, 503, 504}
+# Seconds to connect and to wait for each read, so a stalled connection is
+# retried rather than holding up its fetch for good
+TIMEOUT = (10, 60)
+
+
+class RateLimit:
+    """Remaining request budget of one token for one github api resource."""
+
+    # Below this many remaining requests, spread them evenly until the reset
+    reserve: int = 50
+
+    def __init__(self) -> None:
+        self.remaining: int | None = None
+        self.reset: float | None = None
+        self.cost = 0
+        self.lock = Lock()
+
+    def update(self, remaining, reset, cost: int = 0) -> None:
+        with self.lock:
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset is not None:
+                self.reset = float(reset)
+            self.cost += cost
+
+    def delay(self) -> float:
+        with self.lock:
+            if self.remaining is None or self.reset is None:
+                return 0
+            until_reset = max(self.reset - time.time(), 0)
+            if self.remaining <= 0:
+                return until_reset + 1
+            if self.remaining < self.reserve:
+                return until_reset / self.remaining
+            return 0
+
+    def wait(self) -> None:
+        if (delay := self.delay()) > 0:
+            time.sleep(delay)
+
+
+class ETagStore:
+    """LRU of ``(etag, body, links)`` for conditional GETs, keyed by token and url.
+
+    Bodies are kept as the raw response bytes, of which at most ``max_bytes``
+    are held.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2**20) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items: OrderedDict[tuple[str, str], tuple] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: tuple[str, str]) -> tuple | None:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        return None
+
+    def put(self, key: tuple[str, str], value: tuple) -> None:
+        if len(value[1]) > self.max_bytes:
+            return
+        with self._lock:
+            if (old := self._items.pop(key, None)) is not None:
+                self.bytes -= len(old[1])
+            self._items[key] = value
+            self.bytes += len(value[1])
+            while self.bytes > self.max_bytes:
+                self.bytes -= len(self._items.popitem(last=False)[1][1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+
+# Shared between every fetch so concurrent dashboard users of the same token
+# pace themselves against one budget and reuse each other's ETags
+RATE_LIMITS: dict[tuple[str, str], RateLimit] = {}
+_RATE_LIMITS_LOCK = Lock()
+ETAGS = ETagStore()
+
+
+def token_scope(token: str) -> str:
+    """Short digest identifying a token without keeping the token itself."""
+    return hashlib.sha256((token or "").encode()).hexdigest()[:16]
+
+
+def rate_limit(token_id: str, resource: str) -> RateLimit:
+    with _RATE_LIMITS_LOCK:
+        return RATE_LIMITS.setdefault((token_id, resource), RateLimit())
+
+
+class GitHubClient:
+    """Pooled http session for the github api shared by both fetchers.
+
+    Requests are paced against the token's rate limit, transient failures and
+    secondary rate limits are retried with backoff and REST GETs are sent with
+    ``If-None-Match`` so unchanged pages come back as cheap 304s.
+    """
+
+    def __init__(
+        self,
+        headers: dict,
+        *,
+        api_url: str | None = None,
+        pool_size: int = 8,
+        retries: int = 5,
+        backoff: float = 1.0,
+        timeout: tuple[float, float] = TIMEOUT,
+    ) -> None:
+        self.api_url = (api_url or DEFAULT_API_URL).rstrip("/")
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.token_id = hashlib.sha256(
+            headers.get("Authorization", "").encode()
+        ).hexdigest()[:16]
+
+    def _wait_time(self, response: requests.Response, attempt: int) -> float | None:
+        """Seconds to wait before retrying ``response`` or None if final."""
+        status = response.status_code
+        if attempt >= self.retries or status not in (403, 429, *RETRY_STATUS):
+            return None
+        backoff = self.backoff * 2**attempt * (1 + random.random())
+        if (retry_after := response.headers.get("Retry-After")) is not None:
+            # Seconds, or an http date which the backoff stands in for
+            try:
+                return max(float(retry_after), 0)
+            except ValueError:
+                return backoff
+        if status in (403, 429):
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                reset = float(response.headers.get("X-RateLimit-Reset", time.time()))
+                return max(reset - time.time(), 0) + 1
+            if status == 403:
+                return None
+        return backoff
+
+    @staticmethod
+    def _record(response: requests.Response, resource: str) -> None:
+        metrics.API_REQUESTS.inc(resource=resource, status=response.status_code)
+        metrics.API_BYTES.inc(len(response.content), resource=resource)
+        if (remaining := response.headers.get("X-RateLimit-Remaining")) is not None:
+            metrics.RATE_LIMIT_REMAINING.set(int(remaining), resource=resource)
+        # Conditional requests answered with a 304 do not count against the
+        # REST budget and GraphQL reports its cost in the response body
+        if resource != "graphql" and response.status_code != 304:
+            metrics.RATE_LIMIT_USED.inc(resource=resource)
+
+    def request(self, method: str, url: str, resource: str, **kwargs):
+        limit = rate_limit(self.token_id, resource)
+        for attempt in range(self.retries + 1):
+            limit.wait()
+            try:
+                with metrics.API_SECONDS.time(resource=resource):
+                    response = self.session.request(
+                        method, url, timeout=self.timeout, **kwargs
+                    )
+            except (requests.ConnectionError, requests.Timeout) as error:
+                metrics.API_REQUESTS.inc(resource=resource, status="error")
+                if attempt >= self.retries:
+                    raise
+                metrics.API_RETRIES.inc(
+                    resource=resource,
+                    reason="timeout"
+                    if isinstance(error, requests.Timeout)
+                    else "connection",
+                )
+                time.sleep(self.backoff * 2**attempt * (1 + random.random()))
+                continue
+            self._record(response, resource)
+            limit.update(
+                response.headers.get("X-RateLimit-Remaining"),
+                response.headers.get("X-RateLimit-Reset"),
+            )
+            if (wait := self._wait_time(response, attempt)) is None:
+                return response
+            metrics.API_RETRIES.inc(resource=resource, reason=response.status_code)
+            time.sleep(wait)
+        return response
+
+    def get(self, url: str) -> tuple[object, dict]:
+        """JSON body and ``Link`` header of a REST GET, revalidated by ETag."""
+        key = (self.token_id, url)
+        headers = {}
+        if (cached := ETAGS.get(key)) is not None:
+            headers["If-None-Match"] = cached[0]
+        response = self.request("GET", url, "core", headers=headers)
+        if response.status_code == 304 and cached is not None:
+            return json.loads(cached[1]), cached[2]
+        response.raise_for_status()
+        # Incremental urls change with every sync so are rarely revalidated
+        if (etag := response.headers.get("ETag")) and "since=" not in url:
+            ETAGS.put(key, (etag, response.content, response.links))
+        return response.json(), response.links
+
+    def graphql(self, query: str, variables: dict) -> dict:
+        for attempt in range(self.retries + 1):
+            response = self.request(
+                "POST",
+                f"{self.api_url}/graphql",
+                "graphql",
+                json={"query": query, "variables": variables},
+            )
+            response.raise_for_status()
+            data = response.json()
+            if budget := (data.get("data") or {}).get("rateLimit"):
+                metrics.RATE_LIMIT_USED.inc(budget["cost"], resource="graphql")
+                metrics.RATE_LIMIT_REMAINING.set(budget["remaining"], resource="graphql")
+                rate_limit(self.token_id, "graphql").update(
+                    budget["remaining"],
+                    datetime.fromisoformat(
+                        budget["resetAt"].replace("Z", "+00:00")
+                    ).timestamp(),
+                    budget["cost"],
+                )
+            rate_limited = any(
+                error.get("type") == "RATE_LIMITED" for error in data.get("errors", [])
+            )
+            if not rate_limited or attempt >= self.retries:
+                return data
+            # The next request waits for the reset once the budget is spent
+            metrics.API_RETRIES.inc(resource="graphql", reason="rate limited")
+            rate_limit(self.token_id, "graphql").update(0, None)
+            time.sleep(self.backoff * 2**attempt)
+        return data
@@ -0,0 +1,63 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Encodings in order of preference
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+)
+# Responses smaller than this are not worth compressing
+MIN_BYTES = 1024
+
+
+def choose_encoding(accept_encoding: str, allowed=ENCODINGS) -> str | None:
+    """The preferred encoding in ``allowed`` that the client accepts."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0
+        accepted[name.strip().lower()] = quality
+    for encoding in allowed:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str, level: int = 6) -> bytes:
+    if encoding == "br":
+        # Brotli quality runs to 11, keep the cost similar to gzip's level
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level)
+
+
+def compress_response(response, accept_encoding: str, *, allowed=ENCODINGS, level=6):
+    """Compress a Flask ``response`` in place if the client accepts it."""
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.is_streamed and not response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or not (response.mimetype or "").startswith(COMPRESSIBLE)
+        or (encoding := choose_encoding(accept_encoding, allowed)) is None
+    ):
+        return response
+    response.direct_passthrough = False
+    data = response.get_data()
+    if len(data) < MIN_BYTES:
+        return response
+    response.set_data(compress(data, encoding, level))
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
@@ -0,0 +1,194 @@
+import weakref
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import wraps
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    "issue_number",
+    "title",
+    "created_at",
+    "closed_at",
+    "is_pr",
+    "labels",
+    "milestone",
+    "author",
+]
+# Columns buffered as python lists, labels being tuples of names
+LISTS = ["title", "created_at", "closed_at", "labels", "milestone", "author"]
+
+
+@dataclass
+class Progress:
+    """How far a fetch has got, yielded with every batch of records."""
+
+    pages: int = 0
+    items: int = 0
+    total_pages: int | None = None
+    total_items: int | None = None
+
+    def fraction(self) -> float | None:
+        if self.total_pages:
+            return min(self.pages / self.total_pages, 1)
+        if self.total_items:
+            return min(self.items / self.total_items, 1)
+        return None
+
+
+class RecordBuffer:
+    """Column buffers that fetchers append issues and pull requests to.
+
+    Numbers and flags go straight into typed arrays; timestamps are kept as
+    the api strings and parsed in one vectorised pass by ``to_frame``.
+    """
+
+    def __init__(self) -> None:
+        self.issue_number = array("i")
+        self.is_pr = array("b")
+        self.title: list[str] = []
+        self.created_at: list[str] = []
+        self.closed_at: list[str | None] = []
+        self.labels: list[tuple[str, ...]] = []
+        self.milestone: list[str | None] = []
+        self.author: list[str | None] = []
+
+    def __len__(self) -> int:
+        return len(self.issue_number)
+
+    def append(
+        self,
+        issue_number: int,
+        title: str,
+        created_at: str,
+        closed_at: str | None,
+        *,
+        is_pr: bool,
+        labels: tuple[str, ...] = (),
+        milestone: str | None = None,
+        author: str | None = None,
+    ) -> None:
+        self.issue_number.append(issue_number)
+        self.title.append(title)
+        self.created_at.append(created_at)
+        self.closed_at.append(closed_at)
+        self.is_pr.append(is_pr)
+        self.labels.append(labels)
+        self.milestone.append(milestone)
+        self.author.append(author)
+
+    def set(self, index: int, **fields) -> None:
+        for name, value in fields.items():
+            getattr(self, name)[index] = value
+
+    def to_frame(self, start: int = 0, stop: int | None = None) -> pd.DataFrame:
+        rows = slice(start, stop)
+        return self._frame(rows, {name: getattr(self, name)[rows] for name in LISTS})
+
+    def take(self, indices) -> pd.DataFrame:
+        """Typed frame of the records at ``indices``."""
+        rows = np.asarray(indices, dtype=np.intp)
+        return self._frame(
+            rows, {name: [getattr(self, name)[i] for i in rows] for name in LISTS}
+        )
+
+    def _frame(self, rows, lists: dict[str, list]) -> pd.DataFrame:
+        labels = np.empty(len(lists["labels"]), dtype=object)
+        labels[:] = lists["labels"]
+        return typed(
+            pd.DataFrame({
+                "issue_number": np.array(self.issue_number, dtype=np.int32)[rows],
+                "is_pr": np.array(self.is_pr, dtype=bool)[rows],
+                **lists,
+                "labels": labels,
+            })
+        )
+
+
+def typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce fetched columns to the dataset schema."""
+    if df.empty:
+        df = pd.DataFrame(columns=COLUMNS)
+    # Datasets from before labels, milestones and authors were kept have none
+    missing = {
+        column: pd.Series([empty] * len(df), index=df.index, dtype=object)
+        for column, empty in (("labels", ()), ("milestone", None), ("author", None))
+        if column not in df
+    }
+    df = df.assign(**missing)
+    out = pd.DataFrame({
+        "issue_number": df["issue_number"].astype(np.int32),
+        "title": df["title"],
+        "created_at": pd.to_datetime(df["created_at"], utc=True).astype(
+            "datetime64[ns, UTC]"
+        ),
+        "closed_at": pd.to_datetime(df["closed_at"], utc=True).astype(
+            "datetime64[ns, UTC]"
+        ),
+        "is_pr": df["is_pr"].astype(bool),
+        "labels": df["labels"].astype(object),
+        "milestone": df["milestone"].astype("category"),
+        "author": df["author"].astype("category"),
+    })
+    if "repo" in df:
+        out["repo"] = df["repo"].astype("category")
+    return out
+
+
+def combine(frames) -> pd.DataFrame:
+    """Concatenate record batches, later rows replacing earlier ones.
+
+    Fetchers yield corrected records again after extra processing and an
+    incremental refresh yields updated copies of cached records.
+    """
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return typed(pd.DataFrame(columns=COLUMNS))
+    df = pd.concat(frames, ignore_index=True)
+    subset = ["repo", "issue_number"] if "repo" in df else ["issue_number"]
+    return df.drop_duplicates(subset=subset, keep="last", ignore_index=True)
+
+
+def prepare(df: pd.DataFrame, now: datetime | None = None) -> pd.DataFrame:
+    """Add the derived ``end_date`` and ``months`` columns used by the figures."""
+    df = typed(df)
+    now = pd.Timestamp(now or datetime.now(timezone.utc)).tz_convert("UTC")
+    df["end_date"] = df["closed_at"].fillna(now)
+    df["months"] = (df["end_date"] - df["created_at"]).dt.days / 30
+    return df
+
+
+def to_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """Fetched columns with api-style ISO timestamp strings for storage."""
+    out = df[COLUMNS].copy()
+    for column in ("created_at", "closed_at"):
+        out[column] = df[column].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    out = out.astype(object)
+    return out.where(out.notna(), None)
+
+
+def per_dataset(build):
+    """Memoise ``build(df)`` for as long as ``df`` lives.
+
+    Results are keyed by the frame's id and dropped when it is collected, so
+    summaries of a dataset are computed on first use and kept with it.
+    """
+    results = {}
+    lock = Lock()
+
+    @wraps(build)
+    def cached(df: pd.DataFrame):
+        with lock:
+            if (found := results.get(id(df))) is not None:
+                return found
+        found = build(df)
+        with lock:
+            if id(df) not in results:
+                results[id(df)] = found
+                weakref.finalize(df, results.pop, id(df), None)
+            return results[id(df)]
+
+    return cached
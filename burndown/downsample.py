@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+# Markers or line vertices sent to the browser per figure before downsampling
+MAX_POINTS = 10_000
+
+
+def _numeric(values) -> np.ndarray:
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.DatetimeTZDtype) or values.dtype.kind == "M":
+        return pd.DatetimeIndex(values).as_unit("ns").asi8.astype(float)
+    return values.to_numpy(dtype=float, na_value=np.nan)
+
+
+def _cells(values: np.ndarray, n: int) -> np.ndarray:
+    """Which of ``n`` equal-width cells each value falls in, NaN in cell ``n``."""
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.full(len(values), n)
+    lo, hi = values[finite].min(), values[finite].max()
+    scaled = (values - lo) / ((hi - lo) or 1) * n
+    cells = np.minimum(np.nan_to_num(scaled, nan=n), n - 1).astype(np.int64)
+    cells[~finite] = n
+    return cells
+
+
+def lttb(x, y, threshold: int) -> np.ndarray:
+    """Indices of ``threshold`` points keeping the shape of the line (x, y).
+
+    Largest-Triangle-Three-Buckets: the first and last points are kept and
+    each bucket in between keeps the point forming the largest triangle with
+    the previously kept point and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = _numeric(x)
+    y = _numeric(y)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    keep = np.empty(threshold, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        after = slice(hi, edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x, avg_y = x[after].mean(), y[after].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        keep[i + 1] = a
+    return keep
+
+
+def thin_scatter(x, y, max_points: int) -> np.ndarray:
+    """Sorted indices of at most ``max_points`` markers covering (x, y).
+
+    The plot area is split into a grid and one marker is kept per occupied
+    cell, so dense regions are thinned while sparse regions and outliers stay
+    visible. The grid is refined while the markers still fit the budget, as
+    skewed data only occupies a few of the cells.
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    x = _numeric(x)
+    y = _numeric(y)
+
+    def per_cell(side):
+        cell = _cells(x, side) * (side + 1) + _cells(y, side)
+        return np.unique(cell, return_index=True)[1]
+
+    side = max(int(np.sqrt(max_points)) - 1, 1)
+    keep = per_cell(side)
+    while len(keep) > max_points and side > 1:
+        side //= 2
+        keep = per_cell(side)
+    while side < n and len(finer := per_cell(side * 2)) <= max_points:
+        side *= 2
+        keep = finer
+    return np.sort(keep[:max_points])
+
+
+def envelope(x, y0, y1, max_points: int) -> np.ndarray:
+    """Sorted indices of segments (x, y0 to y1) keeping each column's extent.
+
+    ``x`` is split into ``max_points / 2`` columns and each column keeps the
+    segment starting lowest and the one ending highest.
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    frame = pd.DataFrame({
+        "column": _cells(_numeric(x), max(max_points // 2, 1)),
+        "y0": _numeric(y0),
+        "y1": _numeric(y1),
+    })
+    columns = frame.groupby("column")
+    keep = np.union1d(columns["y0"].idxmin().dropna(), columns["y1"].idxmax().dropna())
+    return keep.astype(np.intp)
@@ -0,0 +1,69 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+
+def _typed(values) -> tuple[np.ndarray, bool] | None:
+    """``values`` as a numeric array plotly can base64 encode and whether they
+    were dates, or None if they cannot be encoded.
+
+    Dates become milliseconds since the epoch, which date axes accept, and
+    missing values become NaN, which plotly draws as gaps.
+    """
+    if values is None or isinstance(values, (str, dict)):
+        return None
+    array = np.asarray(values)
+    if array.ndim != 1 or not len(array) or array.dtype.kind in "iufb":
+        return None
+    if array.dtype.kind == "M":
+        return _milliseconds(array), True
+    if array.dtype != object:
+        return None
+    present = array[~pd.isna(array)]
+    if not len(present):
+        return None
+    if isinstance(present[0], (datetime, date, np.datetime64)):
+        return _milliseconds(array), True
+    if isinstance(present[0], (int, float, np.number)) and not isinstance(
+        present[0], bool
+    ):
+        # Plotted numbers with gaps are issue numbers and durations, for which
+        # single precision is plenty
+        numbers = pd.to_numeric(pd.Series(array), errors="coerce")
+        return numbers.to_numpy(np.float32, na_value=np.nan), False
+    return None
+
+
+def _milliseconds(values) -> np.ndarray:
+    stamps = pd.DatetimeIndex(pd.to_datetime(values, utc=True)).as_unit("ns")
+    ms = stamps.asi8 / 1e6
+    ms[stamps.isna()] = np.nan
+    return ms
+
+
+def typed_arrays(fig):
+    """Encode ``fig``'s x and y arrays as numbers, in place, and return it.
+
+    Plotly serialises numeric numpy arrays as compact base64 typed arrays but
+    dates and arrays with gaps as JSON lists of strings and nulls. Date axes
+    are marked as such since they now hold plain numbers.
+    """
+    for trace in fig.data:
+        for name in ("x", "y"):
+            if (typed := _typed(trace[name])) is None:
+                continue
+            trace[name], dates = typed
+            if dates:
+                axis = trace[f"{name}axis"] or name
+                fig.layout[f"{name}axis{axis[1:]}"].type = "date"
+    return fig
+
+
+def typed_builder(build):
+    """Figure builder whose figures are encoded with ``typed_arrays``."""
+
+    def typed_build(df, **options):
+        return typed_arrays(build(df, **options))
+
+    return typed_build
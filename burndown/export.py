@@ -0,0 +1,144 @@
+import os
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from importlib.util import find_spec
+from pathlib import Path
+
+import pandas as pd
+
+from burndown.app import add_fetch_arguments, add_figure_arguments, make_fetcher
+from burndown.cache import DataCache, iter_cached_fetch
+from burndown.dataset import combine, prepare
+from burndown.encoding import typed_arrays
+from burndown.figures import FIGURES, figure_options
+from burndown.repos import expand_repos, iter_repos, parse_repos
+
+FORMATS = ("html", "png", "json", "parquet")
+# Optional packages needed by some formats
+REQUIRES = {"png": ("kaleido",), "parquet": ("pyarrow", "fastparquet")}
+
+# Dataset shared with the figure worker processes by the pool initialiser
+_DATA: pd.DataFrame | None = None
+
+
+def parse_args(argv=None):
+    parser = ArgumentParser(
+        "burndown export", description="Write the burndown figures without a server"
+    )
+    parser.add_argument(
+        "orgrepo",
+        help="org/repo, several separated by commas or org/* for a whole org",
+    )
+    parser.add_argument("--out", default=".", help="Output directory")
+    parser.add_argument(
+        "--format",
+        nargs="+",
+        choices=FORMATS,
+        default=["html"],
+        help="Output formats; parquet writes the dataset rather than a figure",
+    )
+    parser.add_argument(
+        "--token",
+        default=os.environ.get("GITHUB_TOKEN", ""),
+        help="Github token (defaults to $GITHUB_TOKEN)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of processes rendering figures (defaults to the cpu count)",
+    )
+    parser.add_argument("--facet", action="store_true", default=False)
+    add_fetch_arguments(parser)
+    add_figure_arguments(parser)
+    args = parser.parse_args(argv)
+    # Fail before fetching rather than after
+    for fmt in args.format:
+        packages = REQUIRES.get(fmt, ())
+        if packages and not any(find_spec(package) for package in packages):
+            parser.error(f"--format {fmt} requires {' or '.join(packages)}")
+    return args
+
+
+def load(args) -> pd.DataFrame:
+    """Fetch, or refresh from the cache, every repository in ``args.orgrepo``."""
+    cache = None if args.no_cache else DataCache(args.cache_dir)
+    iterate = partial(
+        iter_cached_fetch,
+        make_fetcher(args),
+        cache,
+        token=args.token,
+        debug=args.debug,
+    )
+    repos = expand_repos(parse_repos(args.orgrepo), args.token, args.api_url)
+    return prepare(
+        combine(
+            batch
+            for _, batch, _ in iter_repos(
+                iterate, repos, max_workers=args.repo_concurrency
+            )
+        )
+    )
+
+
+def _init_worker(df: pd.DataFrame) -> None:
+    global _DATA  # noqa: PLW0603
+    _DATA = df
+
+
+def render(
+    tab: str, out: Path, formats: list[str], options: dict, typed: bool
+) -> tuple[str, float]:
+    """Build one figure from the worker's dataset and write it in ``formats``."""
+    start = time.perf_counter()
+    fig = FIGURES[tab](_DATA, **figure_options(tab, **options))
+    if typed:
+        fig = typed_arrays(fig)
+    name = f"figure{tab[1:]}"
+    for fmt in formats:
+        if fmt == "html":
+            fig.write_html(out / f"{name}.html", include_plotlyjs="cdn")
+        elif fmt == "json":
+            fig.write_json(out / f"{name}.json")
+        elif fmt == "png":
+            fig.write_image(out / f"{name}.png")
+    return name, time.perf_counter() - start
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    out = Path(args.out).expanduser()
+    out.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    df = load(args)
+    seconds = time.perf_counter() - start
+    print(f"Fetched {len(df)} issues and pull requests in {seconds:.2f} s")
+
+    if "parquet" in args.format:
+        df.to_parquet(out / "data.parquet")
+
+    formats = [fmt for fmt in args.format if fmt != "parquet"]
+    if not formats:
+        return
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=_init_worker, initargs=(df,)
+    ) as pool:
+        options = {
+            "facet": args.facet,
+            "max_points": args.max_points,
+            "bin_width": args.bin_width,
+            "freq": args.freq,
+        }
+        futures = [
+            pool.submit(render, tab, out, formats, options, args.typed_arrays)
+            for tab in FIGURES
+        ]
+        for future in futures:
+            name, seconds = future.result()
+            print(f"Rendered {name} in {seconds:.2f} s")
+    print(f"Rendered {len(futures)} figures in {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,609 @@
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+import zlib
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import numpy as np
+import pandas as pd
+
+from burndown.cache import DataCache
+from burndown.synthetic import synthetic_frame
+
+ALIAS = re.compile(r"(\w+): issue\(number: (\d+)\)")
+FIRST = re.compile(r"first: (\d+)")
+
+
+def _iso(value) -> str | None:
+    return None if pd.isna(value) else value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _cursor(offset: int) -> str:
+    return base64.b64encode(f"cursor:{offset}".encode()).decode()
+
+
+def _offset(cursor: str | None) -> int:
+    return int(base64.b64decode(cursor).decode().split(":")[1]) if cursor else 0
+
+
+class Budget:
+    """Hourly request budget of one token for one api resource."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+        self.reset = int(time.time()) + 3600
+        self.lock = Lock()
+
+    def spend(self, cost: int) -> bool:
+        with self.lock:
+            if time.time() >= self.reset:
+                self.used = 0
+                self.reset = int(time.time()) + 3600
+            if self.used + cost > self.limit:
+                return False
+            self.used += cost
+            return True
+
+    @property
+    def remaining(self) -> int:
+        return max(self.limit - self.used, 0)
+
+
+class FakeGitHub:
+    """Local stand-in for the parts of the github api the fetchers use.
+
+    Serves the REST issue listing (with ``Link``, ``ETag`` and rate limit
+    headers), the REST comment listings and the GraphQL issue and pull
+    request connections. Repositories are replayed from a ``DataCache`` when
+    ``recorded`` is given and are otherwise generated on first use with
+    ``issues`` records each. Issue ``n`` has ``n % (comments + 1)`` comments,
+    the last of which says it was merged on even issues. Every
+    request waits ``latency`` plus up to ``jitter`` seconds and fails with a
+    502 with probability ``error_rate``, as does each aliased issue lookup.
+    Repositories in ``private`` can only be read with one of their tokens.
+    """
+
+    def __init__(
+        self,
+        *,
+        issues: int = 1000,
+        org_repos: int = 3,
+        recorded: DataCache | None = None,
+        latency: float = 0,
+        jitter: float = 0,
+        error_rate: float = 0,
+        rate_limit: int = 5000,
+        comments: int = 0,
+        private: dict[str, set[str]] | None = None,
+    ) -> None:
+        self.issues = issues
+        self.comments = comments
+        self.private = private or {}
+        self.org_repos = org_repos
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self._repos: dict[str, pd.DataFrame] = {}
+        self._comments: dict[str, pd.DataFrame] = {}
+        self._budgets: dict[tuple[str, str], Budget] = {}
+        self._lock = Lock()
+        self.recorded = recorded is not None
+        if recorded is not None:
+            for orgrepo in recorded.repos():
+                self._repos[orgrepo] = self._index(recorded.load(orgrepo))
+
+    @staticmethod
+    def _index(df: pd.DataFrame) -> pd.DataFrame:
+        # Newest first like the REST listing, with the updated time used by
+        # `since` filters and the pull request ordering
+        df = df.sort_values("created_at", ascending=False, ignore_index=True)
+        df["updated_at"] = df["closed_at"].fillna(df["created_at"])
+        return df
+
+    def repo(self, orgrepo: str) -> pd.DataFrame | None:
+        with self._lock:
+            if orgrepo not in self._repos and not self.recorded:
+                self._repos[orgrepo] = self._index(
+                    synthetic_frame(self.issues, seed=zlib.crc32(orgrepo.encode()))
+                )
+            return self._repos.get(orgrepo)
+
+    def repo_comments(self, orgrepo: str) -> pd.DataFrame | None:
+        """Comments of a repository's issues in the order they were made."""
+        if (df := self.repo(orgrepo)) is None:
+            return None
+        with self._lock:
+            if orgrepo not in self._comments:
+                counts = df["issue_number"].to_numpy() % (self.comments + 1)
+                rows = df.loc[df.index.repeat(counts)]
+                nth = rows.groupby(level=0).cumcount().to_numpy()
+                last = nth == counts[rows.index] - 1
+                comments = pd.DataFrame({
+                    "issue_number": rows["issue_number"].to_numpy(),
+                    "created_at": rows["created_at"].to_numpy()
+                    + pd.to_timedelta(nth + 1, unit="h"),
+                    "body": np.where(
+                        last & (rows["issue_number"].to_numpy() % 2 == 0),
+                        "Merged this",
+                        "A comment",
+                    ),
+                }).sort_values("created_at", ignore_index=True)
+                comments["id"] = np.arange(1, len(comments) + 1)
+                self._comments[orgrepo] = comments
+            return self._comments[orgrepo]
+
+    def readable(self, orgrepo: str, token: str) -> bool:
+        return orgrepo not in self.private or token in self.private[orgrepo]
+
+    def owner_repos(self, owner: str, token: str = "") -> list[str]:
+        if self.recorded:
+            names = [name for name in self._repos if name.split("/")[0] == owner]
+        else:
+            names = [f"{owner}/repo{i}" for i in range(self.org_repos)]
+        return [name for name in names if self.readable(name, token)]
+
+    def budget(self, token: str, resource: str) -> Budget:
+        with self._lock:
+            self.requests += 1
+            return self._budgets.setdefault(
+                (token, resource), Budget(self.rate_limit)
+            )
+
+    def delay(self) -> None:
+        if wait := self.latency + random.random() * self.jitter:
+            time.sleep(wait)
+
+    def fail(self) -> bool:
+        return random.random() < self.error_rate
+
+    def milestones(self, orgrepo: str) -> list[str]:
+        """Milestone titles of a repository, numbered from 1 in this order."""
+        return sorted(self.repo(orgrepo)["milestone"].dropna().unique())
+
+    def filter_issues(self, orgrepo: str, df, query: dict) -> pd.DataFrame:
+        """Rows of the REST listing's ``labels``, ``milestone`` and
+        ``creator`` filters, where every label must be present."""
+        for label in filter(None, query.get("labels", "").split(",")):
+            df = df[df["labels"].map(lambda labels, label=label: label in labels)]
+        if (milestone := query.get("milestone")) == "none":
+            df = df[df["milestone"].isna()]
+        elif milestone == "*":
+            df = df[df["milestone"].notna()]
+        elif milestone:
+            titles = dict(enumerate(self.milestones(orgrepo), 1))
+            df = df[df["milestone"] == titles.get(int(milestone))]
+        if creator := query.get("creator"):
+            df = df[df["author"] == creator]
+        return df
+
+    def rest_issue(self, orgrepo: str, row, base: str) -> dict:
+        issue = {
+            "number": int(row.issue_number),
+            "title": row.title,
+            "state": "open" if pd.isna(row.closed_at) else "closed",
+            "created_at": _iso(row.created_at),
+            "updated_at": _iso(row.updated_at),
+            "closed_at": _iso(row.closed_at),
+            "labels": [{"name": label} for label in row.labels],
+            "milestone": None if pd.isna(row.milestone) else {"title": row.milestone},
+            "user": None if pd.isna(row.author) else {"login": row.author},
+            "comments": int(row.issue_number) % (self.comments + 1),
+            "comments_url": (
+                f"{base}/repos/{orgrepo}/issues/{row.issue_number}/comments"
+            ),
+        }
+        if row.is_pr:
+            issue["pull_request"] = {
+                "url": f"{base}/repos/{orgrepo}/pulls/{row.issue_number}"
+            }
+        return issue
+
+    @staticmethod
+    def rest_comment(orgrepo: str, row, base: str) -> dict:
+        return {
+            "id": int(row.id),
+            "issue_url": f"{base}/repos/{orgrepo}/issues/{row.issue_number}",
+            "body": row.body,
+            "created_at": _iso(row.created_at),
+            "updated_at": _iso(row.created_at),
+        }
+
+    def graphql_node(self, row) -> dict:
+        return {
+            "number": int(row.issue_number),
+            "title": row.title,
+            "createdAt": _iso(row.created_at),
+            "closedAt": _iso(row.closed_at),
+            "updatedAt": _iso(row.updated_at),
+            "labels": {"nodes": [{"name": label} for label in row.labels]},
+            "milestone": None if pd.isna(row.milestone) else {"title": row.milestone},
+            "author": None if pd.isna(row.author) else {"login": row.author},
+            "comments": {"nodes": []},
+        }
+
+    def connection(
+        self, orgrepo, df, variables, *, prs: bool, first: int, by_update: bool
+    ) -> dict:
+        # Unlike the REST listing, any of the labels may be present
+        if labels := variables.get("labels"):
+            df = df[df["labels"].map(lambda names: not set(names).isdisjoint(labels))]
+        if prs:
+            df = df[df["is_pr"]]
+            # Like GitHub, in creation order unless ordered by update
+            df = (
+                df.sort_values("updated_at", ascending=False)
+                if by_update
+                else df.sort_values("issue_number")
+            )
+            cursor = variables.get("cursorPRs")
+        else:
+            df = df[~df["is_pr"]].sort_values("created_at")
+            if since := variables.get("since"):
+                df = df[df["updated_at"] >= pd.Timestamp(since)]
+            # As on GitHub, an explicit null milestone matches issues without one
+            milestone = variables.get("milestone", "")
+            df = self.filter_issues(
+                orgrepo,
+                df,
+                {
+                    "creator": variables.get("author"),
+                    "milestone": "none" if milestone is None else milestone,
+                },
+            )
+            cursor = variables.get("cursorIssues")
+        start = _offset(cursor)
+        page = df.iloc[start : start + first]
+        end = start + len(page)
+        return {
+            "edges": [
+                {"node": self.graphql_node(row)} for row in page.itertuples()
+            ],
+            "totalCount": len(df),
+            "pageInfo": {"hasNextPage": end < len(df), "endCursor": _cursor(end)},
+        }
+
+    def graphql(self, query: str, variables: dict, token: str) -> dict:
+        orgrepo = f"{variables.get('owner')}/{variables.get('name')}"
+        aliases = ALIAS.findall(query)
+        cost = 1 + len(aliases) // 100
+        budget = self.budget(token, "graphql")
+        if not budget.spend(cost):
+            return {
+                "errors": [
+                    {"type": "RATE_LIMITED", "message": "API rate limit exceeded"}
+                ]
+            }
+        if not self.readable(orgrepo, token) or (df := self.repo(orgrepo)) is None:
+            return {
+                "data": {"repository": None},
+                "errors": [
+                    {
+                        "type": "NOT_FOUND",
+                        "message": f"Could not resolve to a Repository {orgrepo}",
+                    }
+                ],
+            }
+
+        first = int(match[1]) if (match := FIRST.search(query)) else 100
+        repository = {}
+        if "pullRequests(" in query:
+            repository["pullRequests"] = self.connection(
+                orgrepo,
+                df,
+                variables,
+                prs=True,
+                first=first,
+                by_update="UPDATED_AT" in query,
+            )
+        elif "issues(" in query:
+            repository["issues"] = self.connection(
+                orgrepo, df, variables, prs=False, first=first, by_update=False
+            )
+        numbers = df.set_index("issue_number", drop=False)
+        errors = []
+        for alias, number in aliases:
+            # Like GitHub, a lookup that fails is null with an error naming it
+            # while the rest of the query succeeds
+            repository[alias] = None
+            if int(number) not in numbers.index:
+                errors.append({
+                    "type": "NOT_FOUND",
+                    "path": ["repository", alias],
+                    "message": f"Could not resolve to an issue {number}",
+                })
+            elif self.fail():
+                errors.append({
+                    "path": ["repository", alias],
+                    "message": "Something went wrong while executing your query",
+                })
+            else:
+                row = numbers.loc[int(number)]
+                repository[alias] = {
+                    "number": int(number),
+                    "createdAt": _iso(row["created_at"]),
+                    "comments": {"nodes": []},
+                }
+
+        data = {"repository": repository}
+        if "rateLimit" in query:
+            data["rateLimit"] = {
+                "cost": cost,
+                "remaining": budget.remaining,
+                "resetAt": time.strftime(
+                    "%Y-%m-%dT%H:%M:%SZ", time.gmtime(budget.reset)
+                ),
+            }
+        return {"data": data, "errors": errors} if errors else {"data": data}
+
+    def make_server(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def token(self) -> str:
+                return self.headers.get("Authorization", "").split(" ")[-1]
+
+            def send_json(self, status: int, body, headers=()) -> None:
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def rate_headers(self, budget: Budget, resource: str) -> list:
+                return [
+                    ("X-RateLimit-Limit", str(budget.limit)),
+                    ("X-RateLimit-Remaining", str(budget.remaining)),
+                    ("X-RateLimit-Reset", str(budget.reset)),
+                    ("X-RateLimit-Used", str(budget.used)),
+                    ("X-RateLimit-Resource", resource),
+                ]
+
+            def do_GET(self):
+                api.delay()
+                if api.fail():
+                    self.send_json(502, {"message": "Server Error"})
+                    return
+                url = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                parts = url.path.strip("/").split("/")
+                budget = api.budget(self.token(), "core")
+                if not budget.spend(1):
+                    self.send_json(
+                        403,
+                        {"message": "API rate limit exceeded"},
+                        self.rate_headers(budget, "core"),
+                    )
+                    return
+
+                per_page = min(int(query.get("per_page", 30)), 100)
+                page = int(query.get("page", 1))
+                base = f"http://{self.headers['Host']}"
+                if (
+                    len(parts) >= 3
+                    and parts[0] == "repos"
+                    and not api.readable(f"{parts[1]}/{parts[2]}", self.token())
+                ):
+                    self.send_json(404, {"message": "Not Found"})
+                    return
+                if len(parts) == 3 and parts[0] == "repos":
+                    orgrepo = f"{parts[1]}/{parts[2]}"
+                    if api.repo(orgrepo) is None:
+                        self.send_json(404, {"message": "Not Found"})
+                        return
+                    self.send_json(
+                        200,
+                        {"full_name": orgrepo, "private": orgrepo in api.private},
+                        self.rate_headers(budget, "core"),
+                    )
+                    return
+                if len(parts) == 4 and parts[0] == "repos" and parts[3] == "issues":
+                    orgrepo = f"{parts[1]}/{parts[2]}"
+                    if (df := api.repo(orgrepo)) is None:
+                        self.send_json(404, {"message": "Not Found"})
+                        return
+                    if since := query.get("since"):
+                        df = df[df["updated_at"] >= pd.Timestamp(since)]
+                    df = api.filter_issues(orgrepo, df, query)
+                    items = [
+                        api.rest_issue(orgrepo, row, base)
+                        for row in df.iloc[
+                            (page - 1) * per_page : page * per_page
+                        ].itertuples()
+                    ]
+                    total = len(df)
+                elif len(parts) in (5, 6) and parts[0] == "repos" and (
+                    parts[3:] == ["issues", "comments"] or parts[5:] == ["comments"]
+                ):
+                    orgrepo = f"{parts[1]}/{parts[2]}"
+                    if (df := api.repo_comments(orgrepo)) is None:
+                        self.send_json(404, {"message": "Not Found"})
+                        return
+                    if len(parts) == 6:
+                        df = df[df["issue_number"] == int(parts[4])]
+                    if since := query.get("since"):
+                        df = df[df["created_at"] >= pd.Timestamp(since)]
+                    items = [
+                        api.rest_comment(orgrepo, row, base)
+                        for row in df.iloc[
+                            (page - 1) * per_page : page * per_page
+                        ].itertuples()
+                    ]
+                    total = len(df)
+                elif parts[0] == "repos" and parts[3:] == ["milestones"]:
+                    orgrepo = f"{parts[1]}/{parts[2]}"
+                    if api.repo(orgrepo) is None:
+                        self.send_json(404, {"message": "Not Found"})
+                        return
+                    titles = api.milestones(orgrepo)
+                    items = [
+                        {"number": number, "title": title}
+                        for number, title in enumerate(titles, 1)
+                    ][(page - 1) * per_page : page * per_page]
+                    total = len(titles)
+                elif len(parts) == 3 and parts[0] in ("orgs", "users"):
+                    if not (names := api.owner_repos(parts[1], self.token())):
+                        self.send_json(404, {"message": "Not Found"})
+                        return
+                    items = [
+                        {"full_name": name}
+                        for name in names[(page - 1) * per_page : page * per_page]
+                    ]
+                    total = len(names)
+                else:
+                    self.send_json(404, {"message": "Not Found"})
+                    return
+
+                headers = self.rate_headers(budget, "core")
+                last = max(-(-total // per_page), 1)
+                links = {"first": 1, "last": last}
+                if page > 1:
+                    links["prev"] = page - 1
+                if page < last:
+                    links["next"] = page + 1
+                if last > 1:
+                    headers.append((
+                        "Link",
+                        ", ".join(
+                            f'<{base}{url.path}?{urlencode({**query, "page": n})}>;'
+                            f' rel="{rel}"'
+                            for rel, n in links.items()
+                        ),
+                    ))
+                etag = '"' + hashlib.md5(json.dumps(items).encode()).hexdigest() + '"'
+                headers.append(("ETag", etag))
+                if self.headers.get("If-None-Match") == etag:
+                    # Conditional requests answered with a 304 are free
+                    budget.spend(-1)
+                    self.send_response(304)
+                    for name, value in headers:
+                        self.send_header(name, value)
+                    self.end_headers()
+                    return
+                self.send_json(200, items, headers)
+
+            def do_POST(self):
+                api.delay()
+                if api.fail():
+                    self.send_json(502, {"message": "Server Error"})
+                    return
+                if urlparse(self.path).path.rstrip("/") != "/graphql":
+                    self.send_json(404, {"message": "Not Found"})
+                    return
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                self.send_json(
+                    200,
+                    api.graphql(
+                        body["query"], body.get("variables") or {}, self.token()
+                    ),
+                )
+
+        return ThreadingHTTPServer((host, port), Handler)
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        """Serve from a daemon thread, returning the server (see ``url``)."""
+        server = self.make_server(host, port)
+        Thread(target=server.serve_forever, name="fake-github", daemon=True).start()
+        return server
+
+
+def url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def parse_args(argv=None):
+    parser = ArgumentParser(
+        "burndown fake-api",
+        description="Serve a local stand-in for the github api",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8051)
+    parser.add_argument(
+        "--issues",
+        type=int,
+        default=1000,
+        help="Issues and pull requests generated per repository",
+    )
+    parser.add_argument(
+        "--org-repos",
+        type=int,
+        default=3,
+        help="Repositories listed for any organisation",
+    )
+    parser.add_argument(
+        "--from-cache",
+        default=None,
+        metavar="DIR",
+        help="Replay the repositories recorded in this cache directory instead",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0, help="Seconds added to every request"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0, help="Random extra latency of up to this"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="Fraction of requests failing with a 502",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=5000,
+        help="Hourly request budget of each token",
+    )
+    parser.add_argument(
+        "--comments",
+        type=int,
+        default=0,
+        help="Most comments on a generated issue",
+    )
+    parser.add_argument(
+        "--private",
+        action="append",
+        default=[],
+        metavar="REPO=TOKEN[,TOKEN]",
+        help="Make REPO readable only with the given tokens, may be repeated",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    api = FakeGitHub(
+        issues=args.issues,
+        org_repos=args.org_repos,
+        recorded=DataCache(args.from_cache) if args.from_cache else None,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        comments=args.comments,
+        private={
+            repo: set(tokens.split(","))
+            for repo, _, tokens in (entry.partition("=") for entry in args.private)
+        },
+    )
+    server = api.make_server(args.host, args.port)
+    print(f"Fake github api on {url(server)}, use burndown --api-url {url(server)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -1,3 +1,4 @@
+import inspect
 from datetime import datetime, timezone
 
 import numpy as np
@@ -7,6 +8,9 @@ import plotly.graph_objects as go
 from plotly.colors import sample_colorscale
 from plotly.subplots import make_subplots
 
+from burndown.aggregates import FREQUENCIES, aggregates
+from burndown.downsample import MAX_POINTS, envelope, lttb, thin_scatter
+
 
 def create_colourbar(marker_dict):
     return go.Scatter(
@@ -20,31 +24,156 @@ def create_colourbar(marker_dict):
     )
 
 
-def figure1(df):
-    # Plot 1
-    fig1 = go.Figure()
+def segment_traces(x, y0, y1, colour, numbers, *, bins=32):
+    """Vertical segments from ``y0`` to ``y1`` at ``x`` as a few WebGL traces.
 
-    # Add lines for each issue's open and close dates with color based on months
-    colours = sample_colorscale(
-        "Plasma",
-        np.linspace(0, 1, df["issue_number"].max()),
-    )
-    for _index, row in df.iterrows():
-        fig1.add_trace(
-            go.Scatter(
-                x=[row["months"], row["months"]],
-                y=[row["created_at"], row["end_date"]],
+    ``colour`` is normalised to [0, 1] and grouped into ``bins`` Plasma bins,
+    one ``Scattergl`` per bin with segments separated by gaps, so the number of
+    traces does not grow with the number of issues. The issue ``numbers`` are
+    shown on hover from numeric custom data rather than a text per point.
+    """
+    colour = np.clip(np.nan_to_num(np.asarray(colour, dtype=float)), 0, 1)
+    bin_no = np.minimum((colour * bins).astype(int), bins - 1)
+    x = np.asarray(x, dtype=object)
+    y0 = np.asarray(y0, dtype=object)
+    y1 = np.asarray(y1, dtype=object)
+    numbers = np.asarray(numbers, dtype=np.int32)
+    traces = []
+    for b, c in enumerate(sample_colorscale("Plasma", (np.arange(bins) + 0.5) / bins)):
+        sel = bin_no == b
+        if not sel.any():
+            continue
+        gap = np.full(sel.sum(), None, dtype=object)
+        traces.append(
+            go.Scattergl(
+                x=np.column_stack([x[sel], x[sel], gap]).ravel(),
+                y=np.column_stack([y0[sel], y1[sel], gap]).ravel(),
+                customdata=np.repeat(numbers[sel], 3),
+                hovertemplate="Issue %{customdata}<br>%{x}, %{y}<extra></extra>",
                 mode="lines",
-                line={"color": colours[row["issue_number"] - 1]},
-                name=f"Issue {row['issue_number']}",
+                line={"color": c},
                 showlegend=False,
             ),
         )
+    return traces
+
+
+FACET_WRAP = 3
+
+
+def facet_layout(df, facet, **subplot_kw):
+    """Figure and ``(subset, row, col)`` groups, one subplot per repository.
+
+    Without ``facet`` (or a ``repo`` column) every repository is aggregated
+    into a single plain figure and the only group has no row or column.
+    """
+    if not facet or "repo" not in df:
+        if subplot_kw:
+            return make_subplots(**subplot_kw), [(df, None, None)]
+        return go.Figure(), [(df, None, None)]
+    repos = list(df["repo"].drop_duplicates())
+    rows = -(-len(repos) // FACET_WRAP)
+    cols = min(len(repos), FACET_WRAP)
+    specs = subplot_kw.pop("specs", [[{}]])[0][0]
+    fig = make_subplots(
+        rows=rows,
+        cols=cols,
+        subplot_titles=repos,
+        specs=[[specs] * cols for _ in range(rows)],
+        **subplot_kw,
+    )
+    return fig, [
+        (df[df["repo"] == repo], no // cols + 1, no % cols + 1)
+        for no, repo in enumerate(repos)
+    ]
+
+
+def px_facets(df, facet) -> dict:
+    """Plotly express arguments to facet by repository."""
+    if not facet or "repo" not in df:
+        return {}
+    return {"facet_col": "repo", "facet_col_wrap": FACET_WRAP}
+
+
+def thin_rows(df, x, y, facet, max_points, method=thin_scatter):
+    """Rows of ``df`` reduced to about ``max_points``, shared between facets."""
+    if not max_points or len(df) <= max_points:
+        return df
+    if facet and "repo" in df:
+        groups = [group for _, group in df.groupby("repo", observed=True)]
+    else:
+        groups = [df]
+    budget = max(max_points // len(groups), 1)
+    keep = np.concatenate([
+        group.index[method(group[x], *[group[column] for column in y], budget)]
+        for group in groups
+    ])
+    return df.loc[np.sort(keep)]
+
+
+def note_downsampling(fig, shown: int, total: int) -> None:
+    """Say on the figure that only ``shown`` of ``total`` points are drawn."""
+    if shown < total:
+        fig.add_annotation(
+            text=f"Downsampled: showing {shown:,} of {total:,} points",
+            xref="paper",
+            yref="paper",
+            x=1,
+            y=1,
+            xanchor="right",
+            yanchor="bottom",
+            showarrow=False,
+            font={"size": 11, "color": "#7f8c8d"},
+        )
+
+
+def range_slider(faceted: bool) -> dict:
+    # A range slider under the first of many subplots overlaps the next row
+    return {"rangeslider": {"visible": not faceted}, "autorange": True}
+
+
+def figure1(df, *, batched=True, facet=False, max_points=MAX_POINTS):
+    # Plot 1
+    shown = thin_rows(
+        df, "months", ["created_at", "end_date"], facet, max_points, envelope
+    )
+    fig1, groups = facet_layout(shown, facet)
+    scaled = (df["issue_number"] - 1) / max(df["issue_number"].max() - 1, 1)
+
+    # Add lines for each issue's open and close dates with color based on months
+    for sub, row, col in groups:
+        if batched:
+            fig1.add_traces(
+                segment_traces(
+                    sub["months"],
+                    sub["created_at"],
+                    sub["end_date"],
+                    scaled[sub.index],
+                    sub["issue_number"],
+                ),
+                rows=row,
+                cols=col,
+            )
+            continue
+        colours = sample_colorscale("Plasma", scaled[sub.index])
+        for no, (_index, row_) in enumerate(sub.iterrows()):
+            fig1.add_trace(
+                go.Scatter(
+                    x=[row_["months"], row_["months"]],
+                    y=[row_["created_at"], row_["end_date"]],
+                    mode="lines",
+                    line={"color": colours[no]},
+                    name=f"Issue {row_['issue_number']}",
+                    showlegend=False,
+                ),
+                row=row,
+                col=col,
+            )
 
     fig1.update_layout(
         xaxis_title="Months",
         yaxis_title="Time span",
-        xaxis={"rangeslider": {"visible": True}, "autorange": True},
+        xaxis=range_slider(len(groups) > 1),
         yaxis={"autorange": True, "fixedrange": False},
         coloraxis={"colorscale": "Plasma", "colorbar": {"title": "Issue Number"}},
     )
@@ -62,39 +191,57 @@ def figure1(df):
     })
 
     fig1.add_trace(colourbar_trace)
+    note_downsampling(fig1, len(shown), len(df))
 
     return fig1
 
 
-def figure2(df):
+def figure2(df, *, batched=True, facet=False, max_points=MAX_POINTS):
     # # Plot 2
-    fig2 = go.Figure()
+    shown = thin_rows(
+        df, "issue_number", ["created_at", "end_date"], facet, max_points, envelope
+    )
+    fig2, groups = facet_layout(shown, facet)
 
     max_duration = df["months"].max()
     min_duration = df["months"].min()
 
-    colours = sample_colorscale(
-        "Plasma",
-        (df["months"] - min_duration) / (max_duration - min_duration),
-    )
+    scaled = (df["months"] - min_duration) / (max_duration - min_duration)
     # Add lines for each issue's open and close dates with color based on months
-    for no, (_index, row) in enumerate(df.iterrows()):
-        fig2.add_trace(
-            go.Scatter(
-                x=[row["issue_number"], row["issue_number"]],
-                y=[row["created_at"], row["end_date"]],
-                mode="lines",
-                line={"color": colours[no]},
-                name=f"Issue {row['issue_number']}",
-                showlegend=False,
-            ),
-        )
+    for sub, row, col in groups:
+        if batched:
+            fig2.add_traces(
+                segment_traces(
+                    sub["issue_number"],
+                    sub["created_at"],
+                    sub["end_date"],
+                    scaled[sub.index],
+                    sub["issue_number"],
+                ),
+                rows=row,
+                cols=col,
+            )
+            continue
+        colours = sample_colorscale("Plasma", scaled[sub.index])
+        for no, (_index, row_) in enumerate(sub.iterrows()):
+            fig2.add_trace(
+                go.Scatter(
+                    x=[row_["issue_number"], row_["issue_number"]],
+                    y=[row_["created_at"], row_["end_date"]],
+                    mode="lines",
+                    line={"color": colours[no]},
+                    name=f"Issue {row_['issue_number']}",
+                    showlegend=False,
+                ),
+                row=row,
+                col=col,
+            )
 
     # Update layout
     fig2.update_layout(
         xaxis_title="Issue number",
         yaxis_title="Time taken to close issue",
-        xaxis={"rangeslider": {"visible": True}, "autorange": True},
+        xaxis=range_slider(len(groups) > 1),
         yaxis={"autorange": True, "fixedrange": False},
         coloraxis={
             "colorbar": {"title": "Duration (Months)"},
@@ -112,107 +259,186 @@ def figure2(df):
     })
 
     fig2.add_trace(colourbar_trace)
+    note_downsampling(fig2, len(shown), len(df))
     return fig2
 
 
-def figure3(df):
+def figure3(df, *, facet=False, max_points=MAX_POINTS):
+    shown = thin_rows(df, "end_date", ["months"], facet, max_points)
     fig3 = px.scatter(
-        df,
+        shown,
         x="end_date",
         y="months",
         color="issue_number",
         title="Issue number vs Time taken to complete",
+        **px_facets(df, facet),
     )
     fig3.update_layout(
-        xaxis={"rangeslider": {"visible": True}, "autorange": True},
+        xaxis=range_slider(bool(px_facets(df, facet))),
         yaxis={"autorange": True, "fixedrange": False},
     )
+    note_downsampling(fig3, len(shown), len(df))
     return fig3
 
 
-def figure4(df):
+def figure4(df, *, facet=False, max_points=MAX_POINTS):
+    shown = thin_rows(df, "end_date", ["issue_number"], facet, max_points)
     fig4 = px.scatter(
-        df,
+        shown,
         x="end_date",
         y="issue_number",
         color="months",
         title="Issue close date vs Issue number",
+        **px_facets(df, facet),
     )
     fig4.update_layout(
-        xaxis={"rangeslider": {"visible": True}, "autorange": True},
+        xaxis=range_slider(bool(px_facets(df, facet))),
         yaxis={"autorange": True, "fixedrange": False},
     )
+    note_downsampling(fig4, len(shown), len(df))
     return fig4
 
 
-def figure5(df):
-    fig5 = px.histogram(
-        df,
+def figure5(df, *, facet=False, bin_width=1):
+    # Only the bin counts are sent, the histogram is drawn as touching bars
+    facets = px_facets(df, facet)
+    stats = aggregates(df).histogram(bin_width, facet=bool(facets))
+    fig5 = px.bar(
+        stats,
         x="months",
+        y="count",
         log_y=True,
         title="Binned distribution of time taken to complete issues",
+        **facets,
     )
+    fig5.update_traces(offset=0, width=bin_width)
     fig5.update_layout(
-        xaxis={"rangeslider": {"visible": True}, "autorange": True},
+        bargap=0,
+        xaxis=range_slider(bool(facets)),
         yaxis={"autorange": True, "fixedrange": False},
     )
     return fig5
 
 
-def figure6(df):
-    start = pd.to_datetime(df["created_at"])
-    end = pd.to_datetime(df["end_date"], format="mixed")
-    days = pd.date_range(
-        start=start.min(),
-        end=datetime.now().replace(tzinfo=timezone.utc),
-        freq="D",
-    )
+def _epoch_ns(values) -> np.ndarray:
+    return pd.DatetimeIndex(pd.to_datetime(values, utc=True)).as_unit("ns").asi8
 
-    def dd(day):
-        return (day > start) & (day < end)
 
-    df2 = pd.DataFrame({
-        "days": days,
-        "issues": [(dd(day) & ~df["is_pr"]).sum() for day in days],
-        "pull requests": [(dd(day) & df["is_pr"]).sum() for day in days],
-    })
+def open_counts(start, end, *, freq="D", origin=None, stop=None) -> pd.Series:
+    """Count items open (``start < t < end``) at every step of a date range.
 
-    fig6 = make_subplots(specs=[[{"secondary_y": True}]])
-    fig6 = fig6.add_trace(
-        go.Scatter(x=df2["days"], y=df2["issues"], name="Issues", mode="lines"),
-    )
-    fig6 = fig6.add_trace(
-        go.Scatter(
-            x=df2["days"],
-            y=df2["pull requests"],
-            name="Pull Requests",
-            mode="lines",
-        ),
-        secondary_y=True,
+    Sweep-line over the sorted start and end times, so the cost is
+    O((n + steps) log n) rather than O(n * steps).
+    The range runs from ``origin`` (default: earliest start) to ``stop``
+    (default: now) at frequency ``freq``.
+    """
+    start = _epoch_ns(start)
+    end = _epoch_ns(end)
+    steps = pd.date_range(
+        start=pd.Timestamp(start.min(), tz="UTC") if origin is None else origin,
+        end=datetime.now(timezone.utc) if stop is None else stop,
+        freq=freq,
     )
+    # Items that close before they open are never counted; dropping them means
+    # every remaining close event has a matching earlier open event.
+    valid = end > start
+    start = np.sort(start[valid])
+    end = np.sort(end[valid])
+    t = steps.as_unit("ns").asi8
+    opened = np.searchsorted(start, t, side="left")
+    closed = np.searchsorted(end, t, side="right")
+    return pd.Series(opened - closed, index=steps)
+
+
+def figure6(df, *, facet=False, max_points=MAX_POINTS):
+    span = {"origin": df["created_at"].min(), "stop": datetime.now(timezone.utc)}
+    fig6, groups = facet_layout(df, facet, specs=[[{"secondary_y": True}]])
+    # Issue and pull request lines share the budget
+    budget = max_points // (2 * len(groups)) if max_points else 0
+    shown = total = 0
+
+    for sub, row, col in groups:
+        start = sub["created_at"]
+        end = sub["end_date"]
+        is_pr = sub["is_pr"].to_numpy(dtype=bool)
+        issues = open_counts(start[~is_pr], end[~is_pr], **span)
+        prs = open_counts(start[is_pr], end[is_pr], **span)
+        total += len(issues) + len(prs)
+        if budget:
+            issues = issues.iloc[lttb(issues.index, issues.to_numpy(), budget)]
+            prs = prs.iloc[lttb(prs.index, prs.to_numpy(), budget)]
+        shown += len(issues) + len(prs)
+        first = row is None or (row, col) == (1, 1)
+        fig6.add_trace(
+            go.Scatter(
+                x=issues.index,
+                y=issues.to_numpy(),
+                name="Issues",
+                mode="lines",
+                line={"color": "#636efa"},
+                legendgroup="issues",
+                showlegend=first,
+            ),
+            row=row,
+            col=col,
+        )
+        fig6.add_trace(
+            go.Scatter(
+                x=prs.index,
+                y=prs.to_numpy(),
+                name="Pull Requests",
+                mode="lines",
+                line={"color": "#ef553b"},
+                legendgroup="prs",
+                showlegend=first,
+            ),
+            row=row,
+            col=col,
+            secondary_y=True,
+        )
     # Add titles and labels
     fig6.update_layout(
         title_text="Total issues open at any given time",
         xaxis_title="days",
         yaxis_title="Issues",
         yaxis2_title="Pull Requests",
-        xaxis={"rangeslider": {"visible": True}, "autorange": True},
+        xaxis=range_slider(len(groups) > 1),
         yaxis={"autorange": True, "fixedrange": False},
     )
+    note_downsampling(fig6, shown, total)
     return fig6
 
 
-def figure7(df):
-    df["Day"] = pd.to_datetime(df["end_date"], format="mixed").dt.date
-    stats = (
-        df[df["Day"] < datetime.now().date()]
-        .groupby("Day")
-        .size()
-        .reset_index(name="Count")
+def figure7(df, *, facet=False, freq="D"):
+    facets = px_facets(df, facet)
+    period = FREQUENCIES[freq]
+    stats = aggregates(df).closed(freq, facet=bool(facets))
+    fig7 = px.bar(
+        stats,
+        x=period,
+        y="Count",
+        title=f"Issues closed per {period.lower()}",
+        **facets,
     )
-    fig7 = px.bar(stats, x="Day", y="Count", title="Issues closed per day")
     fig7.update_layout(
-        xaxis={"rangeslider": {"visible": True}, "autorange": True},
+        xaxis=range_slider(bool(facets)),
         yaxis={"autorange": True, "fixedrange": False},
     )
     return fig7
+
+
+FIGURES = {
+    "p1": figure1,
+    "p2": figure2,
+    "p3": figure3,
+    "p4": figure4,
+    "p5": figure5,
+    "p6": figure6,
+    "p7": figure7,
+}
+
+
+def figure_options(tab: str, **options) -> dict:
+    """The ``options`` accepted by figure ``tab``, e.g. to key cached figures."""
+    accepted = inspect.signature(FIGURES[tab]).parameters
+    return {name: value for name, value in options.items() if name in accepted}
@@ -0,0 +1,192 @@
+import weakref
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+from burndown.dataset import per_dataset
+
+# Filtered views kept per dataset
+MAX_VIEWS = 8
+
+
+@dataclass(frozen=True)
+class Filters:
+    """Which issues to analyse: any of ``labels``, by milestone title and
+    author login, created between the ``start`` and ``end`` dates.
+
+    Fetchers push what GitHub can filter on down into their queries, which
+    may return more than asked for but never less. ``FilterIndex`` applies
+    the exact filters to a loaded dataset.
+    """
+
+    labels: tuple[str, ...] = ()
+    milestone: str | None = None
+    author: str | None = None
+    start: str | None = None
+    end: str | None = None
+
+    @classmethod
+    def from_inputs(
+        cls, labels=None, milestone=None, author=None, start=None, end=None
+    ) -> "Filters":
+        """Filters from the dashboard controls, labels comma separated."""
+        names = (name.strip() for name in (labels or "").split(","))
+        return cls(
+            tuple(dict.fromkeys(name for name in names if name)),
+            (milestone or "").strip() or None,
+            (author or "").strip().lstrip("@") or None,
+            str(start)[:10] if start else None,
+            str(end)[:10] if end else None,
+        )
+
+    def __bool__(self) -> bool:
+        return self != Filters()
+
+    @property
+    def since(self) -> str | None:
+        """``start`` as a GitHub timestamp; issues created since were updated since."""
+        return f"{self.start}T00:00:00Z" if self.start else None
+
+    def covers(self, other: "Filters") -> bool:
+        """Whether every issue ``other`` matches also matches these filters."""
+        return (
+            (not self.labels or set(other.labels or [None]) <= set(self.labels))
+            and self.milestone in (None, other.milestone)
+            and self.author in (None, other.author)
+            and (self.start is None or (other.start or "") >= self.start)
+            and (self.end is None or (other.end or "9999") <= self.end)
+        )
+
+    def key(self) -> str:
+        """Short stable text for cache keys."""
+        return repr(tuple(asdict(self).values()))
+
+    def describe(self) -> str:
+        parts = []
+        if self.labels:
+            parts.append(f"labelled {' or '.join(self.labels)}")
+        if self.milestone:
+            parts.append(f"in milestone {self.milestone}")
+        if self.author:
+            parts.append(f"by {self.author}")
+        if self.start or self.end:
+            parts.append(f"created {self.start or '...'} to {self.end or '...'}")
+        return ", ".join(parts)
+
+
+def latest(*timestamps: str | None) -> str | None:
+    """The latest of the given ISO timestamps that are set."""
+    return max((t for t in timestamps if t), default=None)
+
+
+def milestone_number(client, orgrepo: str, title: str) -> int | None:
+    """Number of the milestone of ``orgrepo`` called ``title``, which the
+    issue queries filter on, or None if there is no such milestone."""
+    url = f"{client.api_url}/repos/{orgrepo}/milestones?state=all&per_page=100"
+    while url:
+        milestones, links = client.get(url)
+        for milestone in milestones:
+            if milestone["title"] == title:
+                return milestone["number"]
+        url = links.get("next", {}).get("url")
+    return None
+
+
+class FilterIndex:
+    """Indexes of one dataset that make applying ``Filters`` cheap.
+
+    Each label has a bitmap of the rows carrying it, milestones and authors
+    are categorical codes and creation times are sorted once, so a filter is
+    a few bitwise operations and binary searches. Recent views are kept.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        # Not a reference, so the index goes when the dataset does
+        self.df = weakref.ref(df)
+        self.rows = len(df)
+        labels = pd.Series(
+            df["labels"].to_numpy() if "labels" in df else [()] * self.rows
+        )
+        labels = labels.explode().dropna()
+        codes, names = pd.factorize(labels)
+        positions = labels.index.to_numpy()
+        self.labels = {}
+        for code, name in enumerate(names):
+            bits = np.zeros(self.rows, dtype=bool)
+            bits[positions[codes == code]] = True
+            self.labels[name] = np.packbits(bits)
+        self.milestones = self._categorical(df, "milestone")
+        self.authors = self._categorical(df, "author")
+        created = df["created_at"].to_numpy(dtype="datetime64[ns]")
+        self.order = np.argsort(created, kind="stable")
+        self.created = created[self.order]
+        self._views: OrderedDict[Filters, pd.DataFrame] = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _categorical(df: pd.DataFrame, column: str):
+        if column not in df:
+            return pd.Categorical([None] * len(df))
+        return pd.Categorical(df[column])
+
+    @staticmethod
+    def _equals(values: pd.Categorical, value: str) -> np.ndarray:
+        if value not in values.categories:
+            return np.zeros(len(values), dtype=bool)
+        return values.codes == values.categories.get_loc(value)
+
+    def mask(self, filters: Filters) -> np.ndarray:
+        """Which rows match ``filters``."""
+        mask = np.ones(self.rows, dtype=bool)
+        if filters.labels:
+            bits = [self.labels[name] for name in filters.labels if name in self.labels]
+            if not bits:
+                return np.zeros(self.rows, dtype=bool)
+            any_label = np.bitwise_or.reduce(bits)
+            mask &= np.unpackbits(any_label, count=self.rows).astype(bool)
+        if filters.milestone:
+            mask &= self._equals(self.milestones, filters.milestone)
+        if filters.author:
+            mask &= self._equals(self.authors, filters.author)
+        if filters.start or filters.end:
+            lo, hi = 0, self.rows
+            if filters.start:
+                lo = np.searchsorted(self.created, np.datetime64(filters.start), "left")
+            if filters.end:
+                end = np.datetime64(filters.end) + np.timedelta64(1, "D")
+                hi = np.searchsorted(self.created, end, "left")
+            window = np.zeros(self.rows, dtype=bool)
+            window[self.order[lo:hi]] = True
+            mask &= window
+        return mask
+
+    def view(self, filters: Filters) -> pd.DataFrame:
+        """The rows of the dataset matching ``filters``, keeping its attrs."""
+        df = self.df()
+        if not filters:
+            return df
+        with self._lock:
+            if (found := self._views.get(filters)) is not None:
+                self._views.move_to_end(filters)
+                return found
+        view = df[self.mask(filters)]
+        view.attrs = df.attrs
+        with self._lock:
+            self._views[filters] = view
+            while len(self._views) > MAX_VIEWS:
+                self._views.popitem(last=False)
+        return view
+
+
+@per_dataset
+def filter_index(df: pd.DataFrame) -> FilterIndex:
+    """The ``FilterIndex`` of ``df``, built on first use and kept with it."""
+    return FilterIndex(df)
+
+
+def apply_filters(df: pd.DataFrame, filters: Filters | None) -> pd.DataFrame:
+    """Rows of ``df`` matching ``filters``."""
+    return filter_index(df).view(filters) if filters else df
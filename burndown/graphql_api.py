@@ -1,64 +1,94 @@
-import math
+import time
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from threading import Condition
 
 import pandas as pd
 import requests
 
+from burndown import metrics
+from burndown.client import GitHubClient
+from burndown.dataset import Progress, RecordBuffer, combine
+from burndown.filters import Filters, latest, milestone_number
+
 
 class Query:
     start: str = """
     query($owner: String!, $name: String!,"""
     start_issue: str = " $cursorIssues: String"
-    start_pr: str = "$cursorPRs: String"
+    start_pr: str = " $cursorPRs: String"
+    # Issue filters by the attribute and variable holding them, with the
+    # variable's type and filterBy field. Only those set are sent, since
+    # some treat an explicit null as a filter of their own, e.g. a null
+    # milestoneNumber matches issues without a milestone
+    issue_filters: dict[str, tuple[str, str]] = {
+        "since": ("DateTime", "since"),
+        "labels": ("[String!]", "labels"),
+        "author": ("String", "createdBy"),
+        "milestone": ("String", "milestoneNumber"),
+    }
     mid: str = """) {
+      rateLimit {
+        cost
+        remaining
+        resetAt
+      }
       repository(owner: $owner, name: $name) {
     """
     end: str = """
       }
     }
     """
-    issue: str = """
-        issues(first: 100, after: $cursorIssues, states: [OPEN, CLOSED]) {
+    issue_start: str = """
+        issues(
+          first: 100,
+          after: $cursorIssues,
+          states: [OPEN, CLOSED]"""
+    pr_start: str = """
+        pullRequests(
+          first: 100,
+          after: $cursorPRs,
+          states: [OPEN, CLOSED]"""
+    # Incremental fetches stop at the first PR not updated since. Full crawls
+    # keep the stable default order, in which PRs updated meanwhile do not
+    # move behind the cursor
+    pr_order: str = """,
+          orderBy: {field: UPDATED_AT, direction: DESC}"""
+    edges_start: str = """
+        ) {
           edges {
-            node {
+            node {"""
+    fields: str = """
               number
               title
               createdAt
               closedAt
-              labels(first: 10) {
+              author {
+                login
+              }
+              milestone {
+                title
+              }
+              labels(first: 20) {
                 nodes {
                   name
                 }
-              }
+              }"""
+    pr_fields: str = """
+              updatedAt"""
+    process_fields: str = """
               comments(first: 10) {
                 nodes {
                   body
                   createdAt
                 }
-              }
+              }"""
+    node_end: str = """
             }
-            cursor
-          }
-          pageInfo {
-            hasNextPage
-            endCursor
-          }
-        }"""
-    pr: str = """
-        pullRequests(first: 100, after: $cursorPRs, states: [OPEN, CLOSED]) {
-          edges {
-            node {
-              number
-              title
-              createdAt
-              closedAt
-              labels(first: 10) {
-                nodes {
-                  name
-                }
-              }
-            }
-            cursor
           }
+          totalCount
           pageInfo {
             hasNextPage
             endCursor
@@ -66,6 +96,11 @@ class Query:
         }"""
     just_issue_start: str = """
     query($owner: String!, $name: String!) {
+      rateLimit {
+        cost
+        remaining
+        resetAt
+      }
       repository(owner: $owner, name: $name) {"""
     issue_no: str = "issue{}: issue(number: {})"
     just_issue_end: str = """{
@@ -79,163 +114,414 @@ class Query:
         }
     """
 
-    def __init__(self, orgrepo: str, token: str) -> None:
+    def __init__(
+        self,
+        orgrepo: str,
+        token: str,
+        since: str | None = None,
+        api_url: str | None = None,
+        filters: Filters | None = None,
+    ) -> None:
         self.headers = {"Authorization": f"Bearer {token}"} if token else {}
         self.owner, self.name = orgrepo.split("/")
+        self.client = GitHubClient(self.headers, api_url=api_url)
+        filters = filters or Filters()
+        self.since = latest(since, filters.since)
+        # Labels are matched if any is present, as in the filters
+        self.labels = list(filters.labels) or None
+        self.author = filters.author
+        self.milestone = None
+        if filters.milestone and (
+            number := milestone_number(self.client, orgrepo, filters.milestone)
+        ):
+            self.milestone = str(number)
+
+    def variables(self, *, prs: bool) -> dict:
+        """The filters that are set, by variable name."""
+        names = ["labels"] if prs else list(self.issue_filters)
+        return {
+            name: getattr(self, name)
+            for name in names
+            if getattr(self, name) is not None
+        }
+
+    def declarations(self, *, prs: bool) -> str:
+        return "".join(
+            f", ${name}: {self.issue_filters[name][0]}"
+            for name in self.variables(prs=prs)
+        )
+
+    @property
+    def issue(self) -> str:
+        filter_by = ", ".join(
+            f"{self.issue_filters[name][1]}: ${name}"
+            for name in self.variables(prs=False)
+        )
+        arguments = f",\n          filterBy: {{{filter_by}}}" if filter_by else ""
+        # comments are only read by extra_processing
+        extra = self.process_fields if needs_extra_processing(self) else ""
+        return (
+            self.issue_start
+            + arguments
+            + self.edges_start
+            + self.fields
+            + extra
+            + self.node_end
+        )
 
     @property
-    def get_pr_and_issue(self) -> str:
+    def pr(self) -> str:
+        arguments = ",\n          labels: $labels" if self.labels else ""
+        order = self.pr_order if self.since else ""
         return (
-            self.start
-            + f"{self.start_issue}, {self.start_pr}{self.mid}"
-            + self.issue
-            + self.pr
-            + self.end
+            self.pr_start
+            + arguments
+            + order
+            + self.edges_start
+            + self.fields
+            + self.pr_fields
+            + self.node_end
         )
 
     @property
     def get_issue(self):
-        return self.start + f"{self.start_issue}{self.mid}" + self.issue + self.end
+        declarations = self.start_issue + self.declarations(prs=False)
+        return self.start + declarations + self.mid + self.issue + self.end
 
     @property
     def get_pr(self):
-        return self.start + f"{self.start_pr}{self.mid}" + self.pr + self.end
-
-    def get_query(self, has_issue, has_pr):
-        if has_pr and has_issue:
-            query = self.get_pr_and_issue
-        elif has_issue:
-            query = self.get_issue
-        elif has_pr:
-            query = self.get_pr
-        else:
-            query = False
-        return query
-
-
-def extra_processing(issues, to_process_issues, query: Query) -> None:
-    further_process = []
-    for issue_no, (ind, issue) in to_process_issues.items():
-        labels = [label["name"] for label in issue["labels"]["nodes"]]
-        is_mr = (
-            "gitlab merge request" in labels
-            and (issue.get("closedAt") or "").startswith("2023-07-07")
-            and issue["title"].endswith(("[merged]", "[closed]"))
+        declarations = self.start_pr + self.declarations(prs=True)
+        return self.start + declarations + self.mid + self.pr + self.end
+
+    def post(self, query: str, **variables) -> dict:
+        return self.client.graphql(
+            query, {"owner": self.owner, "name": self.name, **variables}
         )
 
-        if is_mr:
-            issues[ind]["is_pr"] = True
-            for comment in issue["comments"]["nodes"]:
-                if "merged" in comment["body"] or "closed" in comment["body"]:
-                    issues[ind]["closed_at"] = comment["createdAt"]
-                    break
-            else:
-                further_process.append(issue_no)
-
-        elif (issue.get("closedAt") or "").startswith("2023-07-07"):
-            further_process.append(issue_no)
-
-    loops = math.ceil(len(further_process) / 100)
-    for loop in range(loops):
-        qry = query.just_issue_start
-        for isu in further_process[loop * 100 : (loop + 1) * 100]:
-            qry += query.issue_no.format(isu, isu)
-            qry += query.just_issue_end
-        qry += query.end
-        variables = {
-            "owner": query.owner,
-            "name": query.name,
-        }
-        response = requests.post(
-            "https://api.github.com/graphql",
-            json={"query": qry, "variables": variables},
-            headers=query.headers,
+    def lookup(self, numbers) -> str:
+        aliases = "".join(
+            self.issue_no.format(number, number) + self.just_issue_end
+            for number in numbers
         )
-        data = response.json()
-        if data.get("errors"):
-            print(data.get("errors"))
-        else:
-            for ind, issue in data["data"]["repository"].items():
-                created_at = (
-                    issue["createdAt"]
-                    if len(issue["comments"]["nodes"]) == 0
-                    else issue["comments"]["nodes"][-1]["createdAt"]
+        return self.just_issue_start + aliases + self.end
+
+
+# Issue lookups per query: GitHub allows 500,000 nodes per query and each
+# lookup asks for up to 100 comments. Batches are also kept to a rate limit
+# cost and a duration well inside GitHub's 10 second timeout.
+MAX_BATCH = 500
+NODE_LIMIT = 500_000
+NODES_PER_LOOKUP = 101
+MAX_BATCH_COST = 5
+MAX_BATCH_SECONDS = 4
+LOOKUP_ATTEMPTS = 4
+
+
+class IssueLookups:
+    """Closing dates of issues looked up by number while pagination runs.
+
+    Numbers queued with ``add`` are sent as aliased ``issue(number:)``
+    queries by up to ``concurrency`` threads. Each batch is sized from the
+    cost and duration of the one before and halved after a failed query, and
+    only the lookups that failed are sent again.
+    """
+
+    def __init__(self, query: Query, concurrency: int = 4) -> None:
+        self.query = query
+        self.pool = ThreadPoolExecutor(max_workers=max(concurrency, 1))
+        self.size = 100
+        self.pending: list[int] = []
+        self.in_flight = 0
+        self.flushing = False
+        self.attempts = Counter()
+        self.closed_at: dict[int, str] = {}
+        self.failed: list[int] = []
+        self.errors: list[str] = []
+        self.done = Condition()
+
+    def add(self, number: int) -> None:
+        with self.done:
+            self.pending.append(number)
+        self._send()
+
+    def _send(self) -> None:
+        # Batches are only sent full until pagination has finished
+        batches = []
+        with self.done:
+            while self.pending and (self.flushing or len(self.pending) >= self.size):
+                batches.append(self.pending[: self.size])
+                del self.pending[: self.size]
+            self.in_flight += len(batches)
+        for batch in batches:
+            self.pool.submit(self._lookup, batch)
+
+    def _lookup(self, numbers: list[int]) -> None:
+        try:
+            started = time.monotonic()
+            try:
+                data = self.query.post(self.query.lookup(numbers))
+            except requests.RequestException as error:
+                data = {"errors": [{"message": str(error)}]}
+            seconds = time.monotonic() - started
+            repository = (data.get("data") or {}).get("repository")
+            if repository is None:
+                self._resize(len(numbers) // 2)
+                self._retry(numbers, data.get("errors"))
+                return
+            not_found = {
+                error["path"][-1]
+                for error in data.get("errors", [])
+                if error.get("type") == "NOT_FOUND" and error.get("path")
+            }
+            failed = []
+            with self.done:
+                for number in numbers:
+                    alias = f"issue{number}"
+                    if (issue := repository.get(alias)) is not None:
+                        comments = issue["comments"]["nodes"]
+                        self.closed_at[number] = (
+                            comments[-1]["createdAt"] if comments else issue["createdAt"]
+                        )
+                    elif alias not in not_found:
+                        failed.append(number)
+            if budget := data["data"].get("rateLimit"):
+                self._resize(
+                    int(MAX_BATCH_COST * len(numbers) / max(budget["cost"], 1)),
+                    int(MAX_BATCH_SECONDS * len(numbers) / max(seconds, 1e-3)),
                 )
-                issues[to_process_issues[issue["number"]][0]]["closed_at"] = created_at
+            self._retry(failed, data.get("errors"))
+        finally:
+            with self.done:
+                self.in_flight -= 1
+                self.done.notify_all()
+
+    def _resize(self, *sizes: int) -> None:
+        with self.done:
+            self.size = max(
+                min(*sizes, MAX_BATCH, NODE_LIMIT // NODES_PER_LOOKUP, self.size * 2),
+                1,
+            )
+
+    def _retry(self, numbers: list[int], errors) -> None:
+        with self.done:
+            self.attempts.update(numbers)
+            retry = [n for n in numbers if self.attempts[n] < LOOKUP_ATTEMPTS]
+            self.pending.extend(retry)
+            if len(retry) < len(numbers):
+                self.failed.extend(n for n in numbers if n not in retry)
+                self.errors.extend(
+                    error.get("message", str(error)) for error in errors or []
+                )
+        self._send()
+
+    def results(self) -> dict[int, str]:
+        """Send the remaining lookups and wait for every answer.
+
+        Raises if any lookup still failed after ``LOOKUP_ATTEMPTS``, as
+        those issues would keep their migration date as closing date.
+        """
+        with self.done:
+            self.flushing = True
+        self._send()
+        with self.done:
+            self.done.wait_for(lambda: not self.pending and not self.in_flight)
+        self.pool.shutdown()
+        if self.failed:
+            raise RuntimeError(
+                f"Looking up {len(self.failed)} migrated issues failed: "
+                + "; ".join(dict.fromkeys(self.errors))
+            )
+        return self.closed_at
 
 
-def extra_processing_check(query, issue, issues, to_process) -> None:
-    if query.name == "process" and (issue.get("closedAt") or "").startswith(
+def is_gitlab_mr(issue) -> bool:
+    labels = [label["name"] for label in issue["labels"]["nodes"]]
+    return (
+        "gitlab merge request" in labels
+        and (issue.get("closedAt") or "").startswith("2023-07-07")
+        and issue["title"].endswith(("[merged]", "[closed]"))
+    )
+
+
+def merge_comment(issue) -> str | None:
+    for comment in issue["comments"]["nodes"]:
+        if "merged" in comment["body"] or "closed" in comment["body"]:
+            return comment["createdAt"]
+    return None
+
+
+def extra_processing(
+    issues: RecordBuffer, to_process_issues, lookups: IssueLookups
+) -> None:
+    for ind, issue in to_process_issues.values():
+        if is_gitlab_mr(issue):
+            issues.set(ind, is_pr=True)
+            if (closed_at := merge_comment(issue)) is not None:
+                issues.set(ind, closed_at=closed_at)
+    for issue_no, closed_at in lookups.results().items():
+        issues.set(to_process_issues[issue_no][0], closed_at=closed_at)
+
+
+def needs_extra_processing(query) -> bool:
+    return query.name == "process"
+
+
+def extra_processing_check(query, issue, issues, to_process, lookups) -> None:
+    if needs_extra_processing(query) and (issue.get("closedAt") or "").startswith(
         "2023-07-07",
     ):
         to_process[issue["number"]] = (len(issues), issue)
+        # Lookups start now rather than after pagination
+        if not (is_gitlab_mr(issue) and merge_comment(issue)):
+            lookups.add(issue["number"])
 
 
-def fetch_github_data(orgrepo: str, token: str, *, debug: bool) -> pd.DataFrame:
-    issues = []
+def paginate(
+    q_setup: Query, *, prs: bool, debug: bool
+) -> Iterator[tuple[list[dict], int]]:
+    """Walk one of the issue or pull request connections.
 
-    q_setup = Query(orgrepo, token)
-
-    cursor_issues = cursor_prs = None
-    has_next_page_issues = has_next_page_prs = True
+    Yields the nodes of each page with the connection's total count.
+    """
+    query, connection, cursor_name = (
+        (q_setup.get_pr, "pullRequests", "cursorPRs")
+        if prs
+        else (q_setup.get_issue, "issues", "cursorIssues")
+    )
+    variables = q_setup.variables(prs=prs)
+    cursor = None
     page_count = 0
-    to_process = {}
-    while (query := q_setup.get_query(has_next_page_issues, has_next_page_prs)) and (
-        (debug and page_count < 3) or not debug
-    ):
-        variables = {
-            "owner": q_setup.owner,
-            "name": q_setup.name,
-            "cursorIssues": cursor_issues,
-            "cursorPRs": cursor_prs,
-        }
-        response = requests.post(
-            "https://api.github.com/graphql",
-            json={"query": query, "variables": variables},
-            headers=q_setup.headers,
-        )
-        data = response.json()
-
-        if data.get("errors"):
-            print(data.get("errors"))
-            has_next_page_prs = has_next_page_issues = False
-            continue
-
-        if has_next_page_issues:
-            for edge in data["data"]["repository"]["issues"]["edges"]:
-                issue = edge["node"]
-                extra_processing_check(q_setup, issue, issues, to_process)
-                issues.append({
-                    "issue_number": issue["number"],
-                    "title": issue["title"],
-                    "created_at": issue["createdAt"],
-                    "closed_at": issue.get("closedAt", None),
-                    "is_pr": False,
-                })
-            # Check if there are more pages
-            page_info_is = data["data"]["repository"]["issues"]["pageInfo"]
-            has_next_page_issues = page_info_is["hasNextPage"]
-            cursor_issues = page_info_is["endCursor"]
-
-        if has_next_page_prs:
-            for edge in data["data"]["repository"]["pullRequests"]["edges"]:
-                issue = edge["node"]
-                issues.append({
-                    "issue_number": issue["number"],
-                    "title": issue["title"],
-                    "created_at": issue["createdAt"],
-                    "closed_at": issue["closedAt"],
-                    "is_pr": True,
-                })
-
-            # Check if there are more pages
-            page_info_pr = data["data"]["repository"]["pullRequests"]["pageInfo"]
-            has_next_page_prs = page_info_pr["hasNextPage"]
-            cursor_prs = page_info_pr["endCursor"]
+    has_next_page = True
+    while has_next_page and ((debug and page_count < 3) or not debug):
+        data = q_setup.post(query, **variables, **{cursor_name: cursor})
+
+        if errors := data.get("errors"):
+            # Rate limits were retried by the client, anything else would
+            # leave a partial dataset that looks complete
+            raise RuntimeError(
+                "GitHub GraphQL errors: "
+                + "; ".join(error.get("message", str(error)) for error in errors)
+            )
 
+        page = data["data"]["repository"][connection]
+        nodes = [edge["node"] for edge in page["edges"]]
+        # PRs cannot be filtered by `since` so they are ordered by
+        # most recently updated and we stop at the first stale one
+        if prs and q_setup.since:
+            fresh = [node for node in nodes if node["updatedAt"] >= q_setup.since]
+            if len(fresh) < len(nodes):
+                yield fresh, page["totalCount"]
+                return
+        yield nodes, page["totalCount"]
+
+        # Check if there are more pages
+        has_next_page = page["pageInfo"]["hasNextPage"]
+        cursor = page["pageInfo"]["endCursor"]
         page_count += 1
 
+
+def stream(
+    q_setup: Query,
+    *,
+    prs: bool,
+    debug: bool,
+    to_process: dict,
+    out: Queue,
+    lookups: IssueLookups | None = None,
+) -> RecordBuffer:
+    """Collect one connection, putting each page's records on ``out``.
+
+    ``None`` is put on ``out`` when the connection is finished.
+    """
+    issues = RecordBuffer()
+    try:
+        for nodes, total in paginate(q_setup, prs=prs, debug=debug):
+            start = len(issues)
+            for issue in nodes:
+                if not prs:
+                    extra_processing_check(
+                        q_setup, issue, issues, to_process, lookups
+                    )
+                issues.append(
+                    issue["number"],
+                    issue["title"],
+                    issue["createdAt"],
+                    issue.get("closedAt", None),
+                    is_pr=prs,
+                    labels=tuple(label["name"] for label in issue["labels"]["nodes"]),
+                    milestone=(issue.get("milestone") or {}).get("title"),
+                    author=(issue.get("author") or {}).get("login"),
+                )
+            out.put((prs, issues.to_frame(start), total))
+    finally:
+        out.put(None)
+    return issues
+
+
+def iter_github_data(
+    orgrepo: str,
+    token: str,
+    *,
+    debug: bool,
+    since: str | None = None,
+    concurrency: int = 8,
+    api_url: str | None = None,
+    filters: Filters | None = None,
+) -> Iterator[tuple[pd.DataFrame, Progress]]:
+    """Yield a batch of records for every page of issues or pull requests.
+
+    Records changed by extra processing are yielded again at the end, so
+    later batches replace earlier records with the same issue number.
+    ``filters`` are pushed down to both connections as far as GitHub allows.
+    """
+    q_setup = Query(orgrepo, token, since, api_url, filters)
+    to_process = {}
+    lookups = (
+        IssueLookups(q_setup, concurrency) if needs_extra_processing(q_setup) else None
+    )
+    batches = Queue()
+    progress = Progress()
+    totals = {}
+
+    # The issue and pull request cursors are independent so page through both
+    # connections at the same time
+    with ThreadPoolExecutor(max_workers=min(2, max(concurrency, 1))) as pool:
+        issues = pool.submit(
+            stream,
+            q_setup,
+            prs=False,
+            debug=debug,
+            to_process=to_process,
+            out=batches,
+            lookups=lookups,
+        )
+        prs = pool.submit(
+            stream, q_setup, prs=True, debug=debug, to_process={}, out=batches
+        )
+        running = 2
+        while running:
+            if (item := batches.get()) is None:
+                running -= 1
+                continue
+            is_pr, batch, totals[is_pr] = item
+            progress.pages += 1
+            progress.items += len(batch)
+            progress.total_items = sum(totals.values())
+            metrics.PAGES.inc(backend="graphql")
+            metrics.ITEMS.inc(len(batch), backend="graphql")
+            yield batch, progress
+        issues = issues.result()
+        prs.result()
+
     if to_process != {}:
-        extra_processing(issues, to_process, q_setup)
+        with metrics.EXTRA_PROCESSING_SECONDS.time(backend="graphql"):
+            extra_processing(issues, to_process, lookups)
+        yield issues.take([ind for ind, _ in to_process.values()]), progress
+
 
-    return pd.DataFrame(issues)
+def fetch_github_data(
+    orgrepo: str, token: str, *, debug: bool, **kwargs
+) -> pd.DataFrame:
+    return combine(
+        batch for batch, _ in iter_github_data(orgrepo, token, debug=debug, **kwargs)
+    )
@@ -0,0 +1,159 @@
+import time
+import traceback
+from collections import OrderedDict
+from copy import copy
+from threading import Lock, Thread
+from uuid import uuid4
+
+import pandas as pd
+
+from burndown.dataset import Progress, combine
+from burndown.filters import Filters
+
+# Fetches that received nothing for this long are not joined, in case they hang
+MAX_IDLE_SECONDS = 120
+
+
+class FetchJob:
+    """Fetch running in a background thread whose partial data can be read.
+
+    ``iterate`` yields ``(repo, batch, progress)`` tuples as pages arrive.
+    ``snapshot`` combines everything received so far and ``version`` counts
+    the batches, so pollers can tell when there is something new to show.
+    ``filters`` were pushed down to the fetch, so the data only covers them.
+    ``scope`` identifies the token it fetches with.
+    """
+
+    def __init__(
+        self, name: str, iterate, filters: Filters | None = None, scope: str = ""
+    ) -> None:
+        self.name = name
+        self.iterate = iterate
+        self.filters = filters or Filters()
+        self.scope = scope
+        self.version = 0
+        self.done = False
+        self.error: Exception | None = None
+        self.key: str | None = None
+        self.published = -1
+        # Held by whichever poller publishes the snapshot for everyone
+        self.publishing = Lock()
+        self._batches: list[pd.DataFrame] = []
+        self._progress: dict[str, Progress] = {}
+        self._started = self.updated = time.monotonic()
+        self._lock = Lock()
+        self._thread = Thread(target=self._run, name=f"fetch {name}", daemon=True)
+
+    def start(self) -> "FetchJob":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            for repo, batch, progress in self.iterate():
+                with self._lock:
+                    self._batches.append(batch)
+                    self._progress[repo] = copy(progress)
+                    self.version += 1
+                    self.updated = time.monotonic()
+        except Exception as error:  # noqa: BLE001
+            self.error = error
+            traceback.print_exc()
+        finally:
+            with self._lock:
+                self.done = True
+                self.version += 1
+
+    def snapshot(self) -> tuple[pd.DataFrame, int]:
+        """Every record received so far and the version it corresponds to."""
+        with self._lock:
+            df = combine(self._batches)
+            # Keep the combined frame so the next snapshot only adds new batches
+            self._batches = [df]
+            return df, self.version
+
+    def status(self) -> str:
+        with self._lock:
+            progress = list(self._progress.values())
+        if self.error is not None:
+            return f"Fetching failed: {self.error}"
+        pages = sum(p.pages for p in progress)
+        items = sum(p.items for p in progress)
+        message = f"Fetched {pages} pages, {items:,} items so far"
+        if self.done:
+            return ""
+
+        # A total is only known once every repository has reported one
+        total = Progress(
+            pages,
+            items,
+            sum(p.total_pages for p in progress)
+            if progress and all(p.total_pages for p in progress)
+            else None,
+            sum(p.total_items for p in progress)
+            if progress and all(p.total_items for p in progress)
+            else None,
+        )
+        if fraction := total.fraction():
+            elapsed = time.monotonic() - self._started
+            remaining = elapsed * (1 - fraction) / fraction
+            message += f", about {remaining:.0f} s remaining"
+        return message
+
+
+class FetchJobs:
+    """Recent fetches by id, shared between requests for the same data.
+
+    ``submit`` attaches to a running fetch of the same repositories and
+    filters when its token's data may be shown to the requester, so
+    concurrent submits of one repository crawl it once. Fetches that stopped
+    receiving pages are left to finish on their own. The ``max_jobs``
+    most recent fetches are kept for their pollers.
+    """
+
+    def __init__(self, max_jobs: int = 64) -> None:
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, FetchJob] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, job_id: str | None) -> FetchJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @staticmethod
+    def _joinable(job: FetchJob, name: str, filters: Filters) -> bool:
+        return (
+            not job.done
+            and job.updated > time.monotonic() - MAX_IDLE_SECONDS
+            and job.name == name
+            and job.filters == filters
+        )
+
+    def submit(
+        self, name: str, filters: Filters, scope: str, start, shareable
+    ) -> tuple[str, bool]:
+        """Id of a fetch of ``name`` for ``filters`` and whether it is new.
+
+        ``start()`` starts a fetch with the token of ``scope`` and
+        ``shareable(job)`` says whether another token's fetch may be used.
+        """
+        with self._lock:
+            others = [
+                (job_id, job)
+                for job_id, job in self._jobs.items()
+                if self._joinable(job, name, filters) and job.scope != scope
+            ]
+        # Asking whether another token's data may be shared can take requests,
+        # so is done outside the lock
+        for job_id, job in others:
+            if shareable(job):
+                return job_id, False
+        with self._lock:
+            for job_id, job in self._jobs.items():
+                if self._joinable(job, name, filters) and job.scope == scope:
+                    return job_id, False
+            job_id = uuid4().hex
+            self._jobs[job_id] = start()
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            return job_id, True
@@ -0,0 +1,213 @@
+import time
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+
+# Upper bounds in seconds of the duration histograms
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [
+        name + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """A named family of values keyed by label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+        self._values: dict[tuple, object] = {}
+        self._lock = Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_labels(self.labelnames, key)} {value}"
+                for key, value in self._values.items()
+            ]
+
+    def render(self) -> str:
+        return "\n".join([
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ])
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets=BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(
+                key, ([0] * len(self.buckets), 0.0, 0)
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                for bound, cumulative in zip(self.buckets, counts):
+                    le = _labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+REGISTRY: list[Metric] = []
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+API_REQUESTS = Counter(
+    "burndown_github_requests_total",
+    "Requests sent to the github api",
+    ("resource", "status"),
+)
+API_SECONDS = Histogram(
+    "burndown_github_request_seconds",
+    "Duration of github api requests",
+    ("resource",),
+)
+API_BYTES = Counter(
+    "burndown_github_response_bytes_total",
+    "Bytes received from the github api",
+    ("resource",),
+)
+API_RETRIES = Counter(
+    "burndown_github_retries_total",
+    "Github api requests retried",
+    ("resource", "reason"),
+)
+RATE_LIMIT_USED = Counter(
+    "burndown_github_rate_limit_used_total",
+    "Rate limit budget consumed (REST requests or GraphQL cost)",
+    ("resource",),
+)
+RATE_LIMIT_REMAINING = Gauge(
+    "burndown_github_rate_limit_remaining",
+    "Rate limit budget left at the last response",
+    ("resource",),
+)
+PAGES = Counter(
+    "burndown_fetch_pages_total",
+    "Pages of issues or pull requests fetched",
+    ("backend",),
+)
+ITEMS = Counter(
+    "burndown_fetch_items_total",
+    "Issues and pull requests fetched",
+    ("backend",),
+)
+EXTRA_PROCESSING_SECONDS = Histogram(
+    "burndown_extra_processing_seconds",
+    "Duration of the extra processing of migrated issues",
+    ("backend",),
+)
+FETCHES = Counter(
+    "burndown_fetches_total",
+    "Dashboard fetch requests, by whether they started, joined or reused a fetch",
+    ("outcome",),
+)
+PUBLISH_SECONDS = Histogram(
+    "burndown_publish_seconds",
+    "Duration of preparing and storing a fetched dataset",
+)
+CALLBACK_SECONDS = Histogram(
+    "burndown_callback_seconds",
+    "Duration of dash callbacks, excluding response serialisation",
+    ("callback",),
+)
+FIGURE_SECONDS = Histogram(
+    "burndown_figure_seconds",
+    "Duration of building and serialising figures",
+    ("figure", "stage"),
+)
+FIGURE_BYTES = Counter(
+    "burndown_figure_bytes_total",
+    "Bytes of serialised figures built",
+    ("figure",),
+)
+HTTP_SECONDS = Histogram(
+    "burndown_http_request_seconds",
+    "Duration of http requests to the dashboard",
+    ("path",),
+)
+HTTP_BYTES = Counter(
+    "burndown_http_response_bytes_total",
+    "Bytes of dashboard http responses before compression",
+    ("path",),
+)
+HTTP_SENT_BYTES = Counter(
+    "burndown_http_sent_bytes_total",
+    "Bytes of dashboard http responses as sent, after any compression",
+    ("path",),
+)
+
+
+def timed(histogram: Histogram, **labels):
+    """Decorator observing the duration of every call in ``histogram``."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
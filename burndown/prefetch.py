@@ -0,0 +1,60 @@
+import re
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Event, Thread
+
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_interval(text: str) -> float:
+    """Seconds in an interval such as ``90``, ``30s``, ``15m``, ``1h`` or ``1d``."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", text)
+    if match is None:
+        raise ValueError(f"Invalid interval {text!r}, expected e.g. 15m")
+    return float(match[1]) * UNITS[match[2] or "s"]
+
+
+def read_repo_list(path: str | Path) -> list[str]:
+    """Repository entries, one per line, ignoring blank lines and # comments."""
+    lines = Path(path).expanduser().read_text().splitlines()
+    return [line.split("#", 1)[0].strip() for line in lines if line.split("#", 1)[0].strip()]
+
+
+class Prefetcher:
+    """Refresh the repositories listed in a file on a timer.
+
+    Runs in a daemon thread, independent of the http request path, refreshing
+    up to ``workers`` entries at once. The file is re-read on every cycle so
+    repositories can be added without a restart.
+    """
+
+    def __init__(self, refresh, path: str | Path, interval: float, workers: int = 2):
+        self.refresh = refresh
+        self.path = path
+        self.interval = interval
+        self.workers = max(workers, 1)
+        self._stop = Event()
+        self._thread = Thread(target=self._run, name="burndown-prefetch", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _refresh(self, entry: str) -> None:
+        try:
+            self.refresh(entry)
+        except Exception:  # noqa: BLE001
+            print(f"Prefetching {entry} failed")
+            traceback.print_exc()
+
+    def run_once(self) -> None:
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(self._refresh, read_repo_list(self.path)))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
@@ -0,0 +1,124 @@
+import re
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from threading import Lock
+
+import pandas as pd
+import requests
+
+from burndown.client import GitHubClient
+from burndown.dataset import Progress
+
+
+def parse_repos(text: str) -> list[str]:
+    """Split a comma or whitespace separated list of ``owner/name`` entries."""
+    repos = [entry.strip() for entry in re.split(r"[,\s]+", text or "")]
+    return list(dict.fromkeys(repo for repo in repos if repo.count("/") == 1))
+
+
+def org_repos(org: str, token: str, api_url: str | None = None) -> list[str]:
+    """Every repository of an organisation (or user) visible to ``token``."""
+    client = GitHubClient(
+        {"Authorization": f"token {token}"} if token else {}, api_url=api_url
+    )
+    for kind in ("orgs", "users"):
+        repos = []
+        page = 1
+        try:
+            while data := client.get(
+                f"{client.api_url}/{kind}/{org}/repos?per_page=100&page={page}"
+            )[0]:
+                repos.extend(repo["full_name"] for repo in data)
+                page += 1
+        except requests.HTTPError as error:
+            if error.response is not None and error.response.status_code == 404:
+                continue
+            raise
+        return repos
+    return []
+
+
+def expand_repos(
+    entries: list[str], token: str, api_url: str | None = None
+) -> list[str]:
+    """Replace ``org/*`` entries with the organisation's repositories."""
+    repos = []
+    for entry in entries:
+        owner, name = entry.split("/")
+        repos.extend(org_repos(owner, token, api_url) if name == "*" else [entry])
+    return list(dict.fromkeys(repos))
+
+
+class RepoAccess:
+    """Whether repositories are public, remembered for ``ttl`` seconds.
+
+    Data of public repositories is the same whichever token fetched it, so
+    may be shared between users, while private repositories can only be
+    read by tokens given access.
+    """
+
+    def __init__(self, api_url: str | None = None, ttl: float = 600) -> None:
+        self.api_url = api_url
+        self.ttl = ttl
+        self._known: dict[str, tuple[bool, float]] = {}
+        self._lock = Lock()
+
+    def public(self, token: str, repos: list[str]) -> bool:
+        """Whether all ``repos`` are public, looked up with ``token``."""
+        for repo in repos:
+            with self._lock:
+                public, expires = self._known.get(repo, (False, 0))
+            if expires < time.monotonic():
+                if (public := self._lookup(token, repo)) is None:
+                    return False
+                with self._lock:
+                    self._known[repo] = (public, time.monotonic() + self.ttl)
+            if not public:
+                return False
+        return True
+
+    def _lookup(self, token: str, repo: str) -> bool | None:
+        """Whether ``repo`` is public, or None if ``token`` cannot tell."""
+        client = GitHubClient(
+            {"Authorization": f"token {token}"} if token else {},
+            api_url=self.api_url,
+            retries=1,
+        )
+        try:
+            data, _ = client.get(f"{client.api_url}/repos/{repo}")
+        except requests.RequestException:
+            return None
+        return not data.get("private", True)
+
+
+def iter_repos(
+    iterate, repos: list[str], *, max_workers: int = 4
+) -> Iterator[tuple[str, pd.DataFrame, Progress]]:
+    """Fetch several repositories concurrently, yielding batches as they arrive.
+
+    ``iterate`` is called with each ``owner/name`` and yields record batches
+    and progress. At most ``max_workers`` repositories are fetched at once.
+    Every batch gets a ``repo`` column.
+    """
+    out = Queue()
+
+    def run(repo):
+        try:
+            for batch, progress in iterate(repo):
+                out.put((repo, batch.assign(repo=repo), progress))
+        finally:
+            out.put(None)
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        futures = [pool.submit(run, repo) for repo in repos]
+        running = len(futures)
+        while running:
+            if (item := out.get()) is None:
+                running -= 1
+                continue
+            yield item
+        for future in futures:
+            future.result()
+
@@ -1,20 +1,124 @@
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlparse
+
 import pandas as pd
-import requests
+
+from burndown import metrics
+from burndown.client import GitHubClient
+from burndown.dataset import Progress, RecordBuffer, combine
+from burndown.filters import Filters, latest, milestone_number
+
+PER_PAGE = 100
 
 
 class Query:
-    def __init__(self, orgrepo: str, token: str) -> None:
+    def __init__(
+        self,
+        orgrepo: str,
+        token: str,
+        since: str | None = None,
+        concurrency: int = 8,
+        api_url: str | None = None,
+        filters: Filters | None = None,
+    ) -> None:
         self.headers = {"Authorization": f"token {token}"} if token else {}
         self.owner, self.name = orgrepo.split("/")
+        self.concurrency = max(concurrency, 1)
+        self.client = GitHubClient(
+            self.headers, api_url=api_url, pool_size=self.concurrency
+        )
+        self.orgrepo = orgrepo
         self.request = (
-            f"https://api.github.com/repos/{orgrepo}/issues?state=all&page={{}}"
+            f"{self.client.api_url}/repos/{orgrepo}/issues"
+            f"?state=all&per_page={PER_PAGE}&page={{}}"
+        )
+        if params := self.filter_params(filters or Filters(), since):
+            self.request += f"&{urlencode(params)}"
+
+    def filter_params(self, filters: Filters, since: str | None) -> dict:
+        """Query parameters narrowing the listing to at least ``filters``."""
+        params = {}
+        # Several labels must all be present, but the filters ask for any
+        if len(filters.labels) == 1:
+            params["labels"] = filters.labels[0]
+        if filters.milestone and (
+            number := milestone_number(self.client, self.orgrepo, filters.milestone)
+        ):
+            params["milestone"] = number
+        if filters.author:
+            params["creator"] = filters.author
+        if since := latest(since, filters.since):
+            params["since"] = since
+        return params
+
+    def get_page(self, page: int) -> tuple[list[dict], dict]:
+        return self.client.get(self.request.format(page))
+
+    def comment_pages(self, since: str) -> Callable[[int], tuple[list[dict], dict]]:
+        """``get_page`` for the comments on every issue, oldest first."""
+        request = (
+            f"{self.client.api_url}/repos/{self.orgrepo}/issues/comments"
+            f"?sort=created&direction=asc&since={since}"
+            f"&per_page={PER_PAGE}&page={{}}"
         )
+        return lambda page: self.client.get(request.format(page))
+
+    def issue_comments(self, url: str) -> list[dict]:
+        comments, links = self.client.get(f"{url}?per_page={PER_PAGE}")
+        while "next" in links:
+            more, links = self.client.get(links["next"]["url"])
+            comments += more
+        return comments
+
+
+def last_page(links: dict) -> int:
+    """Page number of the ``rel="last"`` link, or 1 if there is only one page."""
+    if (last := links.get("last")) is None:
+        return 1
+    return int(parse_qs(urlparse(last["url"]).query)["page"][0])
+
 
+def fetch_comments(query: Query, to_process_issues) -> dict[int, list[dict]]:
+    """Comments of the issues to process, by issue number, oldest first.
 
-def extra_processing(issues, to_process_issues, query):
-    further_process = []
+    They are read from the repository's comment listing, which starts from
+    the oldest of the issues, unless asking for each issue's comments takes
+    fewer requests. Issues the listing is short of, e.g. ones commented on
+    since, are then fetched on their own.
+    """
+    counts = {
+        issue_no: issue["comments"]
+        for issue_no, (_, issue) in to_process_issues.items()
+        if issue["comments"] > 0
+    }
+    if not counts:
+        return {}
+    comments = defaultdict(list)
+    since = min(to_process_issues[issue_no][1]["created_at"] for issue_no in counts)
+    get_page = query.comment_pages(since)
+    first, links = get_page(1)
+    if last_page(links) <= sum(-(-count // PER_PAGE) for count in counts.values()):
+        pages = iter_pages(query, debug=False, get_page=get_page, first=(first, links))
+        for data, _ in pages:
+            for comment in data:
+                issue_no = int(comment["issue_url"].rsplit("/", 1)[1])
+                if issue_no in counts:
+                    comments[issue_no].append(comment)
+    missing = [n for n, count in counts.items() if len(comments[n]) < count]
+    with ThreadPoolExecutor(max_workers=query.concurrency) as pool:
+        urls = (to_process_issues[n][1]["comments_url"] for n in missing)
+        for issue_no, found in zip(missing, pool.map(query.issue_comments, urls)):
+            comments[issue_no] = found
+    return comments
+
+
+def extra_processing(issues: RecordBuffer, to_process_issues, query):
+    comments_by_issue = fetch_comments(query, to_process_issues)
     for issue_no, (ind, issue) in to_process_issues.items():
         labels = [l["name"] for l in issue["labels"]]
+        comments = comments_by_issue.get(issue_no)
 
         is_mr = (
             "gitlab merge request" in labels
@@ -22,27 +126,23 @@ def extra_processing(issues, to_process_issues, query):
             and issue["title"].endswith(("[merged]", "[closed]"))
         )
         if is_mr:
-            issues[ind]["is_pr"] = True
-            if issue["comments"] > 0:
-                response = requests.get(issue["comments_url"], headers=query.headers)
-                comments = response.json()
+            issues.set(ind, is_pr=True)
+            if comments:
                 for comment in comments:
                     if "merged" in comment["body"] or "closed" in comment["body"]:
-                        issues[ind]["closed_at"] = comment["created_at"]
+                        issues.set(ind, closed_at=comment["created_at"])
                         break
                 else:
-                    issues[ind]["closed_at"] = comments[-1].get(
-                        "created_at", issue.get("closed_at")
+                    issues.set(
+                        ind,
+                        closed_at=comments[-1].get("created_at", issue.get("closed_at")),
                     )
 
         elif (issue.get("closed_at") or "").startswith("2023-07-07"):
-            if issue["comments"] > 0:
-                response = requests.get(issue["comments_url"], headers=query.headers)
-                comments = response.json()
-                issues[ind]["closed_at"] = (
-                    comments[-1].get("created_at", issue.get("closed_at"))
-                    if comments
-                    else issue.get("closed_at")
+            if comments:
+                issues.set(
+                    ind,
+                    closed_at=comments[-1].get("created_at", issue.get("closed_at")),
                 )
 
 
@@ -53,31 +153,88 @@ def extra_processing_check(query, issue, issues, to_process) -> None:
         to_process[issue["number"]] = (len(issues), issue)
 
 
-def fetch_github_data(orgrepo, token, *, debug: bool):
-    issues = []
-    page = 1
+def iter_pages(
+    query: Query, *, debug: bool, get_page=None, first=None
+) -> Iterator[tuple[list[dict], int]]:
+    """Yield the issue pages in order with the expected number of pages.
+
+    Pages after the first are fetched concurrently. ``get_page`` walks
+    another listing instead, of which ``first`` may be the first page.
+    """
+    max_page = 29 if debug else None
+    get_page = get_page or query.get_page
+
+    data, links = first or get_page(1)
+    last = last_page(links)
+    if max_page is not None:
+        last = min(last, max_page)
+    yield data, last
+    if last > 1:
+        with ThreadPoolExecutor(max_workers=query.concurrency) as pool:
+            for data, _ in pool.map(get_page, range(2, last + 1)):
+                yield data, last
+
+    # Issues opened while fetching push items onto extra pages, so carry on
+    # one page at a time until an empty or short page like the sequential walk
+    page = last + 1
+    while len(data) == PER_PAGE and (max_page is None or page <= max_page):
+        data, _ = get_page(page)
+        yield data, page
+        page += 1
+
+
+def iter_github_data(
+    orgrepo,
+    token,
+    *,
+    debug: bool,
+    since: str | None = None,
+    concurrency: int = 8,
+    api_url: str | None = None,
+    filters: Filters | None = None,
+) -> Iterator[tuple[pd.DataFrame, Progress]]:
+    """Yield a batch of records for every page fetched.
+
+    Records changed by extra processing are yielded again at the end, so
+    later batches replace earlier records with the same issue number.
+    ``filters`` are pushed down to the listing as far as GitHub allows.
+    """
+    issues = RecordBuffer()
     to_process = {}
-    query = Query(orgrepo, token)
-    while (page < 30) if debug else True:
-        response = requests.get(query.request.format(page), headers=query.headers)
-        data = response.json()
+    query = Query(orgrepo, token, since, concurrency, api_url, filters)
+    progress = Progress()
 
+    for data, total_pages in iter_pages(query, debug=debug):
         if not data:
             break
 
+        start = len(issues)
         for issue in data:
             extra_processing_check(query, issue, issues, to_process)
-            issues.append({
-                "issue_number": issue["number"],
-                "title": issue["title"],
-                "created_at": issue["created_at"],
-                "closed_at": issue.get("closed_at", None),
-                "is_pr": "pull_request" in issue,
-            })
-
-        page += 1
+            issues.append(
+                issue["number"],
+                issue["title"],
+                issue["created_at"],
+                issue.get("closed_at", None),
+                is_pr="pull_request" in issue,
+                labels=tuple(label["name"] for label in issue["labels"]),
+                milestone=(issue.get("milestone") or {}).get("title"),
+                author=(issue.get("user") or {}).get("login"),
+            )
+        progress.pages += 1
+        progress.items = len(issues)
+        progress.total_pages = total_pages
+        metrics.PAGES.inc(backend="rest")
+        metrics.ITEMS.inc(len(data), backend="rest")
+        yield issues.to_frame(start), progress
 
     if to_process != {}:
-        extra_processing(issues, to_process, query)
+        with metrics.EXTRA_PROCESSING_SECONDS.time(backend="rest"):
+            extra_processing(issues, to_process, query)
+        yield issues.take([ind for ind, _ in to_process.values()]), progress
+
 
-    return pd.DataFrame(issues)
+def fetch_github_data(orgrepo, token, *, debug: bool, **kwargs) -> pd.DataFrame:
+    return combine(
+        batch for batch, _ in iter_github_data(orgrepo, token, debug=debug, **kwargs)
+    )
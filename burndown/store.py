@@ -0,0 +1,193 @@
+import json
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from uuid import uuid4
+
+import pandas as pd
+
+from burndown import metrics
+
+
+class DatasetStore:
+    """Bounded server-side store of prepared DataFrames keyed by dataset id.
+
+    The most recently used ``max_items`` datasets are kept in memory. If a
+    ``directory`` is given every dataset is also pickled there, so evicted
+    datasets are reloaded from disk instead of being lost, and the most
+    recently used ``max_files`` pickles are kept. Stores reading datasets
+    another store writes pass ``max_files=None`` to leave the files alone.
+    Pinned datasets are kept until unpinned, on top of both limits.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 8,
+        directory: str | Path | None = None,
+        max_files: int | None = 64,
+    ):
+        self.max_items = max(max_items, 1)
+        self.directory = None if directory is None else Path(directory).expanduser()
+        # Never fewer files than datasets in memory, which are the most recent
+        self.max_files = None if max_files is None else max(max_files, self.max_items)
+        self._data: OrderedDict[str, pd.DataFrame] = OrderedDict()
+        self._files: OrderedDict[str, None] = OrderedDict()
+        self._pinned: set[str] = set()
+        self._lock = Lock()
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if self.max_files is not None:
+                # Pickles left by an earlier run, oldest first
+                for path in sorted(
+                    self.directory.glob("*.pkl"), key=lambda path: path.stat().st_mtime
+                ):
+                    self._files[path.stem] = None
+                self._trim_files()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pkl"
+
+    def _insert(self, key: str, df: pd.DataFrame) -> None:
+        with self._lock:
+            self._data[key] = df
+            self._data.move_to_end(key)
+            self._evict()
+
+    def _evict(self) -> None:
+        unpinned = [k for k in self._data if k not in self._pinned]
+        for key in unpinned[: max(len(unpinned) - self.max_items, 0)]:
+            del self._data[key]
+
+    def _touch(self, key: str) -> None:
+        if self.directory is None or self.max_files is None:
+            return
+        with self._lock:
+            self._files[key] = None
+            self._files.move_to_end(key)
+        self._trim_files()
+
+    def _trim_files(self) -> None:
+        with self._lock:
+            unpinned = [k for k in self._files if k not in self._pinned]
+            evicted = unpinned[: max(len(unpinned) - self.max_files, 0)]
+            for key in evicted:
+                del self._files[key]
+        for key in evicted:
+            self._path(key).unlink(missing_ok=True)
+
+    def put(self, df: pd.DataFrame, *, pinned: bool = False) -> str:
+        key = uuid4().hex
+        if pinned:
+            with self._lock:
+                self._pinned.add(key)
+        if self.directory is not None:
+            df.to_pickle(self._path(key))
+        self._touch(key)
+        self._insert(key, df)
+        return key
+
+    def replace(self, old_key: str | None, df: pd.DataFrame) -> str:
+        """Store ``df`` in place of the dataset ``old_key``, which is dropped."""
+        key = self.put(df)
+        if old_key is not None:
+            self.remove(old_key)
+        return key
+
+    def unpin(self, key: str) -> None:
+        """Let ``key`` be evicted, before any other dataset."""
+        with self._lock:
+            self._pinned.discard(key)
+            if key in self._data:
+                self._data.move_to_end(key, last=False)
+            if key in self._files:
+                self._files.move_to_end(key, last=False)
+            self._evict()
+        self._trim_files()
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._files.pop(key, None)
+            self._pinned.discard(key)
+        if self.directory is not None and key.isalnum():
+            self._path(key).unlink(missing_ok=True)
+
+    def get(self, key: str | None) -> pd.DataFrame | None:
+        if key is None:
+            return None
+        with self._lock:
+            if (df := self._data.get(key)) is not None:
+                self._data.move_to_end(key)
+        if (
+            df is None
+            and self.directory is not None
+            and key.isalnum()
+            and self._path(key).exists()
+        ):
+            df = pd.read_pickle(self._path(key))
+            self._insert(key, df)
+        if df is not None:
+            self._touch(key)
+        return df
+
+
+class FigureCache:
+    """Size-bounded LRU cache of serialised figures.
+
+    Figures are keyed by dataset id, figure id and build parameters and stored
+    as plain JSON-ready dicts. Least recently used entries are evicted once
+    their combined JSON size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._figures: OrderedDict[tuple, tuple[dict, int]] = OrderedDict()
+        self._lock = Lock()
+
+    def get_or_build(self, dataset_key: str, figure_id: str, build, df, **params):
+        """Cached figure, else ``build(df, **params)`` as a figure or JSON string."""
+        key = (dataset_key, figure_id, tuple(sorted(params.items())))
+        with self._lock:
+            if key in self._figures:
+                self.hits += 1
+                self._figures.move_to_end(key)
+                return self._figures[key][0]
+            self.misses += 1
+
+        with metrics.FIGURE_SECONDS.time(figure=figure_id, stage="build"):
+            fig = build(df, **params)
+        with metrics.FIGURE_SECONDS.time(figure=figure_id, stage="serialise"):
+            serialised = fig if isinstance(fig, str) else fig.to_json()
+            figure = json.loads(serialised)
+        metrics.FIGURE_BYTES.inc(len(serialised), figure=figure_id)
+        with self._lock:
+            if key not in self._figures:
+                self._figures[key] = (figure, len(serialised))
+                self.nbytes += len(serialised)
+            while self.nbytes > self.max_bytes and len(self._figures) > 1:
+                _, (_, size) = self._figures.popitem(last=False)
+                self.nbytes -= size
+        return figure
+
+    def invalidate(self, dataset_key: str) -> None:
+        """Drop the figures of a dataset and of its filtered views."""
+        view = f"{dataset_key}:"
+        with self._lock:
+            for key in [
+                key
+                for key in self._figures
+                if key[0] == dataset_key or key[0].startswith(view)
+            ]:
+                self.nbytes -= self._figures.pop(key)[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._figures),
+                "bytes": self.nbytes,
+            }
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from burndown.dataset import typed
+
+# Fixed end date so generated datasets are reproducible
+END = pd.Timestamp("2025-01-01", tz="UTC")
+LABELS = (
+    "bug",
+    "enhancement",
+    "documentation",
+    "question",
+    "good first issue",
+    "help wanted",
+    "duplicate",
+    "wontfix",
+)
+MILESTONES = ("v1.0", "v1.1", "v2.0")
+AUTHORS = 50
+
+
+def synthetic_frame(
+    rows: int,
+    *,
+    repos: int = 1,
+    years: float = 5,
+    open_fraction: float = 0.15,
+    pr_fraction: float = 0.5,
+    seed: int = 0,
+    end: pd.Timestamp = END,
+) -> pd.DataFrame:
+    """Issues and pull requests with the schema the fetchers return.
+
+    Creation times are spread over ``years`` before ``end``, time to close is
+    log-normal (median of about a week) and ``open_fraction`` are left open.
+    Each of ``LABELS`` is on 15% of the records, a third have one of the
+    ``MILESTONES`` and a few of the ``AUTHORS`` open most of them. With
+    several ``repos`` a ``repo`` column is added and numbers restart per
+    repository.
+    """
+    rng = np.random.default_rng(seed)
+    span = int(years * 365.25 * 86400)
+    created = np.sort(rng.integers(0, span, rows)) - span
+    open_ = rng.random(rows) < open_fraction
+    duration = rng.lognormal(np.log(7 * 86400), 1.5, rows).astype(np.int64)
+    closed = np.minimum(created + duration, 0)
+
+    repo = rng.integers(0, repos, rows)
+    number = np.zeros(rows, dtype=np.int64)
+    for r in range(repos):
+        sel = repo == r
+        number[sel] = np.arange(1, sel.sum() + 1)
+
+    # Every combination of labels once, picked per record by its bits
+    has_label = rng.random((rows, len(LABELS))) < 0.15
+    combinations = np.empty(2 ** len(LABELS), dtype=object)
+    combinations[:] = [
+        tuple(label for i, label in enumerate(LABELS) if bits >> i & 1)
+        for bits in range(len(combinations))
+    ]
+    labels = combinations[has_label @ (1 << np.arange(len(LABELS)))]
+    milestone = np.array([*MILESTONES, None], dtype=object)[
+        rng.choice(len(MILESTONES) + 1, rows, p=[0.1] * 3 + [0.7])
+    ]
+    author = np.array([f"user{i}" for i in range(AUTHORS)], dtype=object)[
+        rng.zipf(1.5, rows) % AUTHORS
+    ]
+
+    created_at = end + pd.to_timedelta(created, unit="s")
+    closed_at = end + pd.to_timedelta(closed, unit="s")
+    df = pd.DataFrame({
+        "issue_number": number,
+        "title": [f"Synthetic issue {n}" for n in number],
+        "created_at": created_at,
+        "closed_at": pd.Series(closed_at).where(~open_),
+        "is_pr": rng.random(rows) < pr_fraction,
+        "labels": labels,
+        "milestone": milestone,
+        "author": author,
+    })
+    if repos > 1:
+        df["repo"] = [f"synthetic/repo{r}" for r in repo]
+    # Fetchers return the newest issues first
+    return typed(df.iloc[::-1].reset_index(drop=True))
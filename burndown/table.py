@@ -0,0 +1,101 @@
+import pandas as pd
+
+OPERATORS = [
+    ["ge ", ">="],
+    ["le ", "<="],
+    ["lt ", "<"],
+    ["gt ", ">"],
+    ["ne ", "!="],
+    ["eq ", "="],
+    ["contains "],
+    ["datestartswith "],
+]
+
+
+def split_filter_part(filter_part: str) -> tuple[str | None, str | None, object]:
+    """Split one ``&&`` clause of a DataTable filter query into its parts."""
+    for operator_type in OPERATORS:
+        for operator in operator_type:
+            if operator not in filter_part:
+                continue
+            name_part, value_part = filter_part.split(operator, 1)
+            name = name_part[name_part.find("{") + 1 : name_part.rfind("}")]
+
+            value_part = value_part.strip()
+            v0 = value_part[:1]
+            if v0 and v0 == value_part[-1] and v0 in ("'", '"', "`"):
+                value = value_part[1:-1].replace("\\" + v0, v0)
+            else:
+                try:
+                    value = float(value_part)
+                except ValueError:
+                    value = value_part
+
+            # word operators need spaces after them in the filter string,
+            # but we don't want these later
+            return name, operator_type[0].strip(), value
+
+    return None, None, None
+
+
+def _coerce(column: pd.Series, value):
+    if pd.api.types.is_bool_dtype(column):
+        return str(value).lower() in ("true", "1", "1.0")
+    if pd.api.types.is_datetime64_any_dtype(column):
+        value = pd.Timestamp(str(value))
+        if column.dt.tz is not None and value.tz is None:
+            value = value.tz_localize(column.dt.tz)
+    return value
+
+
+def filter_frame(df: pd.DataFrame, filter_query: str | None) -> pd.DataFrame:
+    """Apply a DataTable ``filter_query`` to ``df``."""
+    if not filter_query:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for filter_part in filter_query.split(" && "):
+        col_name, operator, value = split_filter_part(filter_part)
+        if col_name not in df.columns:
+            continue
+        column = df[col_name]
+        if operator in ("eq", "ne", "lt", "le", "gt", "ge"):
+            try:
+                mask &= getattr(column, operator)(_coerce(column, value))
+            except (TypeError, ValueError):
+                mask &= getattr(column.astype(str), operator)(str(value))
+        elif operator == "contains":
+            mask &= column.astype(str).str.contains(str(value), regex=False)
+        elif operator == "datestartswith":
+            mask &= column.astype(str).str.startswith(str(value))
+    return df[mask]
+
+
+def sort_frame(df: pd.DataFrame, sort_by: list[dict] | None) -> pd.DataFrame:
+    """Apply a DataTable ``sort_by`` specification to ``df``."""
+    sort_by = [col for col in sort_by or [] if col["column_id"] in df.columns]
+    if not sort_by:
+        return df
+    return df.sort_values(
+        [col["column_id"] for col in sort_by],
+        ascending=[col["direction"] == "asc" for col in sort_by],
+        kind="stable",
+    )
+
+
+def table_page(
+    df: pd.DataFrame,
+    page_current: int,
+    page_size: int,
+    sort_by: list[dict] | None = None,
+    filter_query: str | None = None,
+) -> tuple[list[dict], int]:
+    """Records for one page of the filtered, sorted table and the page count."""
+    df = filter_frame(df, filter_query)
+    page_count = max(-(-len(df) // page_size), 1)
+    start = page_current * page_size
+    if sort_by:
+        df = sort_frame(df, sort_by)
+    page = df.iloc[start : start + page_size]
+    if "labels" in page:
+        page = page.assign(labels=page["labels"].map(", ".join))
+    return page.to_dict("records"), page_count
@@ -0,0 +1,69 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import plotly.io as pio
+
+from burndown.encoding import typed_arrays
+from burndown.figures import FIGURES
+from burndown.filters import Filters, apply_filters
+from burndown.store import DatasetStore
+
+# Each worker reads datasets from the server's on-disk store into its own LRU
+_STORE: DatasetStore | None = None
+_TYPED_ARRAYS = True
+
+
+def _init_worker(
+    directory: str, max_items: int, typed: bool, json_engine: str
+) -> None:
+    global _STORE, _TYPED_ARRAYS  # noqa: PLW0603
+    # The server's store decides which files to keep
+    _STORE = DatasetStore(max_items, directory, max_files=None)
+    _TYPED_ARRAYS = typed
+    pio.json.config.default_engine = json_engine
+
+
+def build_figure(key: str, tab: str, options: dict, filters: Filters | None) -> str:
+    """Serialised figure ``tab`` of the stored dataset ``key``."""
+    if (df := _STORE.get(key)) is None:
+        raise KeyError(f"Dataset {key} is not in the store")
+    fig = FIGURES[tab](apply_filters(df, filters), **options)
+    return (typed_arrays(fig) if _TYPED_ARRAYS else fig).to_json()
+
+
+class FigurePool:
+    """Processes that build figures off the GIL of the serving process.
+
+    Datasets are not sent with each job: workers load them by key from the
+    store ``directory`` and keep the ``store_size`` most recent in memory.
+    Workers are spawned rather than forked as the server runs threads.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        directory: str | Path,
+        store_size: int = 8,
+        *,
+        typed_arrays: bool = True,
+        json_engine: str = "auto",
+    ):
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(directory), store_size, typed_arrays, json_engine),
+        )
+
+    def build(
+        self, key: str, tab: str, _df=None, *, filters: Filters | None = None, **options
+    ) -> str:
+        """Build in a worker; the signature matches ``FigureCache`` builders.
+
+        The worker applies ``filters`` to its copy of the dataset.
+        """
+        return self.pool.submit(build_figure, key, tab, options, filters).result()
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(cancel_futures=True)